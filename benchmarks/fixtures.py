@@ -0,0 +1,118 @@
+"""
+fixtures.py  —  Synthetic, offline A/V fixtures for the benchmarks.
+
+Nothing is downloaded: audio is speech-like noise bursts (syllables, gaps and
+pauses, so the planner sees realistic energy dips), video is a moving test
+pattern encoded through ffio.FrameWriter, subtitles are evenly spread cues.
+Everything is seeded, so a given length always produces the same data.
+
+Usage:
+    python -m benchmarks.fixtures OUT_DIR --seconds 120 --size 640x360
+writes OUT_DIR/input.wav (stereo), input_51.wav (5.1), input.mp4 (with the
+stereo audio muxed in) and input.srt, ready for the tempocut CLI.
+"""
+
+import argparse
+import os
+import numpy as np
+import soundfile as sf
+
+# ---------- Tunables ----------
+FIXTURE_SR    = 48000
+SYLLABLE_MS   = (80, 250)    # voiced burst length range
+GAP_MS        = (20, 400)    # silence between bursts
+PAUSE_EVERY   = 12           # roughly one long pause per this many bursts
+PAUSE_MS      = (500, 1500)
+NOISE_FLOOR   = 0.003
+CHANNEL_GAINS = {1: [1.0], 2: [1.0, 0.9], 6: [0.8, 0.8, 1.0, 0.3, 0.5, 0.5]}   # L R C LFE Ls Rs
+VIDEO_FPS     = 24000 / 1001
+# ------------------------------
+
+def _envelope(n, sr, rng):
+    """Per-sample 0..1 loudness: bursts of random level separated by gaps and pauses."""
+    lengths, levels = [], []
+    total = 0
+    while total < n:
+        on = int(rng.uniform(*SYLLABLE_MS) * sr / 1000)
+        off = int(rng.uniform(*(PAUSE_MS if rng.random() < 1/PAUSE_EVERY else GAP_MS)) * sr / 1000)
+        lengths += [on, off]
+        levels += [rng.uniform(0.3, 1.0), 0.0]
+        total += on + off
+    env = np.repeat(np.asarray(levels, dtype=np.float32), lengths)[:n]
+    # 5 ms moving average so bursts have attack/decay instead of clicks
+    k = max(1, sr // 200)
+    c = np.cumsum(np.concatenate([np.zeros(k, np.float32), env]), dtype=np.float64)
+    return ((c[k:] - c[:-k]) / k).astype(np.float32)
+
+def synth_audio(seconds, channels=2, sr=FIXTURE_SR, seed=0):
+    """(n, channels) float32 speech-like audio, or (n,) for channels=1."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    env = _envelope(n, sr, rng)
+    t = np.arange(n, dtype=np.float32) / sr
+    pitch = np.float32(2*np.pi*140) * t
+    voice = 0.5*np.sin(pitch) + 0.25*np.sin(2*pitch) + 0.25*rng.standard_normal(n, dtype=np.float32)
+    mono = 0.5*env*voice
+    gains = CHANNEL_GAINS[channels]
+    x = np.empty((n, channels), dtype=np.float32)
+    for c, g in enumerate(gains):
+        x[:, c] = g*mono + NOISE_FLOOR*rng.standard_normal(n, dtype=np.float32)
+    return x[:, 0] if channels == 1 else x
+
+def test_pattern(k, size):
+    """Frame `k` of the test pattern: a scrolling gradient with a moving white block."""
+    w, h = size
+    x = (np.arange(w, dtype=np.int64) + 4*k) % 256
+    y = np.arange(h, dtype=np.int64) * 255 // max(1, h-1)
+    frame = np.empty((h, w, 3), dtype=np.uint8)
+    frame[..., 0] = x[None, :]
+    frame[..., 1] = y[:, None]
+    frame[..., 2] = (k * 7) % 256
+    bx, by = (k * 5) % max(1, w - 32), (k * 3) % max(1, h - 32)
+    frame[by:by+32, bx:bx+32] = 255
+    return frame
+
+def write_video(path, seconds, size=(640, 360), fps=VIDEO_FPS, audio_path=None):
+    from tempo_cut.ffio import FrameWriter, EncoderSettings
+    settings = EncoderSettings(preset="ultrafast", crf=23)
+    with FrameWriter(path, size, fps, audio_path=audio_path, settings=settings) as writer:
+        for k in range(int(round(seconds * fps))):
+            writer.write(test_pattern(k, size))
+
+def _ts(ms):
+    return "%02d:%02d:%02d,%03d" % (ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+
+def synth_srt(n_cues, seconds):
+    """SRT text with `n_cues` cues spread over `seconds`, every cue 70% of its slot."""
+    slot = seconds * 1000 / max(1, n_cues)
+    lines = []
+    for k in range(n_cues):
+        a = int(k * slot)
+        lines.append(f"{k+1}\n{_ts(a)} --> {_ts(a + int(0.7*slot))}\nline {k} <i>x</i>\n")
+    return "\n".join(lines)
+
+def make_fixtures(out_dir, seconds, size=(640, 360), cues_per_min=20):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, name) for name in ("input.wav", "input_51.wav", "input.mp4", "input.srt")}
+    sf.write(paths["input.wav"], synth_audio(seconds, 2), FIXTURE_SR)
+    sf.write(paths["input_51.wav"], synth_audio(seconds, 6), FIXTURE_SR)
+    write_video(paths["input.mp4"], seconds, size, audio_path=paths["input.wav"])
+    with open(paths["input.srt"], "w", encoding="utf-8") as f:
+        f.write(synth_srt(max(1, int(seconds / 60 * cues_per_min)), seconds))
+    return paths
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def main():
+    ap = argparse.ArgumentParser(description="Write synthetic TempoCut fixtures (audio, video, subtitles).")
+    ap.add_argument("out_dir")
+    ap.add_argument("--seconds", type=float, default=60.0)
+    ap.add_argument("--size", type=parse_size, default=(640, 360), help="Video size WxH (default 640x360)")
+    args = ap.parse_args()
+    for path in make_fixtures(args.out_dir, args.seconds, args.size).values():
+        print("Wrote:", path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+run.py  —  Time and memory-profile TempoCut's hot paths on synthetic fixtures.
+
+Usage (from the repo root):
+    python -m benchmarks.run                      # run, compare against benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline      # run and record a new baseline
+    python -m benchmarks.run --only audio --minutes 1,30 --json results.json
+
+Every case is run --repeat times and the fastest wall time is kept; peak memory
+is the Python/numpy heap high-water mark (tracemalloc) of one extra run, so it
+does not include ffmpeg subprocesses. A case is flagged when it is more than
+--tolerance slower (or hungrier) than the baseline, and the exit status is 1 if
+anything was flagged. Timings only compare across runs on the same machine.
+
+The analysis cache is turned off so every case does the full work.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
+import numpy as np
+
+os.environ["TEMPOCUT_CACHE_MB"] = "0"   # before tempo_cut.cache is imported
+
+from benchmarks.fixtures import FIXTURE_SR, synth_audio, synth_srt, test_pattern, write_video, parse_size
+
+# ---------- Tunables ----------
+BASELINE        = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+RESULTS_VERSION = 1
+TOLERANCE       = 0.25     # flag cases this much slower / bigger than the baseline
+MIN_MEM_DELTA_MB = 1.0     # ignore memory changes smaller than this
+TARGET_RATIO    = 1.03
+GROUPS          = ("audio", "video", "subs")
+# ------------------------------
+
+@dataclass
+class Case:
+    stage: str
+    label: str
+    fn: Callable[[], object]
+    size: float
+    unit: str
+
+    @property
+    def key(self):
+        return f"{self.stage}[{self.label}]"
+
+def measure(fn, repeat):
+    """(fastest wall time in s, peak traced heap in MB) of `fn`."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak / 2**20
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+# ---------- Cases ----------
+# Each generator builds its fixture lazily, so only one size is held in memory at a time.
+
+def audio_cases(minutes):
+    from tempo_cut.skippy import frame_energies, make_skip_plan, apply_removals_with_crossfade
+    frame_len = int(FIXTURE_SR * 0.02)
+    for m in minutes:
+        for name, channels in (("stereo", 2), ("5.1", 6)):
+            x = synth_audio(m*60, channels)
+            removals = make_skip_plan(x, FIXTURE_SR, TARGET_RATIO).removals
+            label = f"{name} {m:g}min"
+            yield Case("audio.energies", label, lambda x=x: frame_energies(x, frame_len), m, "min")
+            yield Case("audio.plan", label, lambda x=x: make_skip_plan(x, FIXTURE_SR, TARGET_RATIO), m, "min")
+            yield Case("audio.render", label, lambda x=x, r=removals: apply_removals_with_crossfade(x, FIXTURE_SR, r), m, "min")
+            del x
+
+def _synthetic_features(minutes, rng):
+    """Mel-like features of `minutes` of audio and a copy with ~3% of the frames cut out."""
+    from tempo_cut.video import TARGET_SR, N_MELS, HOP, TIME_DECIM
+    n = int(minutes*60 * TARGET_SR / HOP / TIME_DECIM)
+    X = np.cumsum(rng.standard_normal((N_MELS, n)), axis=1).astype(np.float32)
+    keep = rng.random(n) >= 1 - 1/TARGET_RATIO
+    return X, np.ascontiguousarray(X[:, keep])
+
+def _plan_warp(seconds, sr=FIXTURE_SR):
+    """Map of a regular skippy plan: a 30 ms chop every 300 ms."""
+    from tempo_cut.warpmap import WarpMap
+    total = int(seconds*sr)
+    removals = [(s, s + int(0.03*sr)) for s in range(int(0.3*sr), total - sr, int(0.3*sr))]
+    return WarpMap.from_plan(removals, total, sr, 8.0)
+
+def video_cases(minutes, video_seconds, size):
+    from tempo_cut.align import banded_dtw
+    from tempo_cut.video import build_time_map_from_wp, frame_schedule, SmearBlender, MICRO_BLEND_ALPHA
+    from tempo_cut.warpmap import WarpMap
+    rng = np.random.default_rng(0)
+    for m in minutes:
+        X, Y = _synthetic_features(m, rng)
+        wp = banded_dtw(X, Y)
+        label = f"{m:g}min"
+        yield Case("video.dtw", label, lambda X=X, Y=Y: banded_dtw(X, Y), m, "min")
+        yield Case("video.time_map", label, lambda wp=wp: WarpMap.from_points(*build_time_map_from_wp(wp)), m, "min")
+
+    from benchmarks.fixtures import VIDEO_FPS
+    w, h = size
+    frames = [test_pattern(k, size) for k in range(48)]
+    for s in video_seconds:
+        warp = _plan_warp(s)
+
+        def make_frames(warp=warp, s=s):
+            # the per-output-frame work of the render loop, minus decode and encode
+            src_idx, smear = frame_schedule(warp, warp.skip_duration, VIDEO_FPS, s)
+            blender = SmearBlender((h, w, 3), MICRO_BLEND_ALPHA, 1)
+            buf = blender.acquire()
+            for k in np.flatnonzero(smear):
+                blender.blend(frames[src_idx[k] % 48], frames[(src_idx[k]+1) % 48], buf)
+            return len(src_idx)
+        yield Case("video.frames", f"{w}x{h} {s:g}s", make_frames, s, "s")
+
+    if not video_seconds:
+        return
+    try:
+        import moviepy.editor  # noqa: F401  (the render stage needs moviepy and ffmpeg)
+    except ImportError:
+        print("⚠️ moviepy not installed, skipping video.render")
+        return
+    from tempo_cut.audio_stereo import compress_file
+    from tempo_cut.ffio import EncoderSettings
+    from tempo_cut.skippy import plan_sidecar_path
+    from tempo_cut.video import time_compress_video
+    import soundfile as sf
+    with tempfile.TemporaryDirectory(prefix="tempocut_bench_") as tmp:
+        for s in video_seconds:
+            wav, mp4 = os.path.join(tmp, f"in{s:g}.wav"), os.path.join(tmp, f"in{s:g}.mp4")
+            skippy = os.path.join(tmp, f"in{s:g}_skippy.wav")
+            sf.write(wav, synth_audio(s, 2), FIXTURE_SR)
+            write_video(mp4, s, size, audio_path=wav)
+            with quiet():
+                compress_file(wav, skippy, target_ratio=TARGET_RATIO)
+
+            def render(mp4=mp4, skippy=skippy, s=s, mode="python"):
+                with quiet():
+                    time_compress_video(mp4, skippy, os.path.join(tmp, f"out{s:g}.mp4"),
+                                        plan_path=plan_sidecar_path(skippy),
+                                        encoder=EncoderSettings(preset="ultrafast"), render=mode)
+            yield Case("video.render", f"{w}x{h} {s:g}s", render, s, "s")
+            yield Case("video.render_ffmpeg", f"{w}x{h} {s:g}s", partial(render, mode="ffmpeg"), s, "s")
+
+def subs_cases(cues):
+    from tempo_cut.subs import retime_file
+    with tempfile.TemporaryDirectory(prefix="tempocut_bench_") as tmp:
+        for n in cues:
+            seconds = 3.0*n
+            src, dst = os.path.join(tmp, f"in{n}.srt"), os.path.join(tmp, f"out{n}.srt")
+            with open(src, "w", encoding="utf-8") as f:
+                f.write(synth_srt(n, seconds))
+            warp = _plan_warp(seconds, sr=1000)
+            yield Case("subs.retime", f"{n} cues", lambda src=src, dst=dst, warp=warp: retime_file(src, dst, warp), n, "cues")
+
+# ---------- Baseline ----------
+
+def machine_info():
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+def compare(results, baseline, tolerance):
+    """Print one line per case; returns the keys that regressed against `baseline`."""
+    base = (baseline or {}).get("results", {})
+    flagged = []
+    print(f"{'case':44} {'time':>10} {'peak MB':>9}  vs baseline")
+    for key, r in results.items():
+        line = f"{key:44} {r['wall_s']*1000:8.1f}ms {r['peak_mb']:9.1f}"
+        b = base.get(key)
+        if b:
+            t_ratio = r["wall_s"] / max(b["wall_s"], 1e-9)
+            m_delta = r["peak_mb"] - b["peak_mb"]
+            slow = t_ratio > 1 + tolerance
+            fat = m_delta > MIN_MEM_DELTA_MB and r["peak_mb"] > b["peak_mb"]*(1 + tolerance)
+            line += f"  x{t_ratio:.2f} time, {m_delta:+.1f} MB"
+            if slow or fat:
+                line += "  ⚠️ regression"
+                flagged.append(key)
+        print(line)
+    return flagged
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark TempoCut's hot paths on synthetic fixtures.")
+    ap.add_argument("--only", default=",".join(GROUPS), help=f"Comma-separated groups to run ({', '.join(GROUPS)})")
+    ap.add_argument("--minutes", default="1,4,12", help="Audio / DTW input lengths in minutes")
+    ap.add_argument("--video-seconds", default="10,30", help="Video input lengths in seconds")
+    ap.add_argument("--video-size", type=parse_size, default=(640, 360), help="Video size WxH")
+    ap.add_argument("--cues", default="1000,10000,100000", help="Subtitle cue counts")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", help="Write the results to this file")
+    ap.add_argument("--baseline", default=BASELINE, help="Baseline file to compare against / save to")
+    ap.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = ap.parse_args()
+
+    floats = lambda text: [float(v) for v in text.split(",") if v.strip()]
+    groups = {g.strip() for g in args.only.split(",")}
+    unknown = groups - set(GROUPS)
+    if unknown:
+        ap.error(f"unknown group(s): {', '.join(sorted(unknown))}")
+    minutes, video_seconds, cues = floats(args.minutes), floats(args.video_seconds), [int(v) for v in floats(args.cues)]
+
+    cases = []
+    if "audio" in groups:
+        cases.append(audio_cases(minutes))
+    if "video" in groups:
+        cases.append(video_cases(minutes, video_seconds, args.video_size))
+    if "subs" in groups:
+        cases.append(subs_cases(cues))
+
+    results = {}
+    for gen in cases:
+        for case in gen:
+            print(f"⏱️ {case.key}", file=sys.stderr)
+            wall, peak = measure(case.fn, args.repeat)
+            results[case.key] = {"stage": case.stage, "label": case.label, "size": case.size, "unit": case.unit,
+                                 "wall_s": round(wall, 6), "peak_mb": round(peak, 3)}
+
+    report = {"version": RESULTS_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "machine": machine_info(), "repeat": args.repeat, "results": results}
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print("⚠️ Baseline was recorded on a different machine; timings are only indicative.")
+    flagged = compare(results, baseline, args.tolerance)
+
+    for path in filter(None, [args.json, args.baseline if args.save_baseline else None]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Wrote:", path)
+    if flagged:
+        print(f"❌ {len(flagged)} case(s) regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+align.py  —  Banded, coarse-to-fine DTW for long programs.
+
+Stand-in for librosa.sequence.dtw(X, Y) in the video stage. It takes the same
+(features x frames) inputs and returns the same warping path format (array of
+(i, j) pairs, end to start), so build_time_map_from_wp works unchanged. The
+coarsest level is searched inside a Sakoe-Chiba band around the expected slope
+(1/target_ratio); every finer level only searches a small radius around the
+projected coarse path, so memory and time grow linearly with duration.
+"""
+
+from typing import Optional
+import numpy as np
+
+# ---------- Tunables ----------
+DTW_BAND_FRAC = 0.05   # Sakoe-Chiba half-width at the coarsest level, fraction of len(Y)
+DTW_RADIUS    = 8      # search radius (frames) around the projected path at finer levels
+DTW_MIN_SIZE  = 256    # stop coarsening once either sequence is this short
+# ------------------------------
+
+def _downsample(X: np.ndarray) -> np.ndarray:
+    if X.shape[1] % 2:
+        X = np.concatenate([X, X[:, -1:]], axis=1)
+    return 0.5 * (X[:, 0::2] + X[:, 1::2])
+
+def _fix_band(lo: np.ndarray, hi: np.ndarray, M: int):
+    """Clip, make monotone and connected, and pin both path ends inside the band."""
+    lo = np.clip(lo, 0, M-1)
+    hi = np.clip(hi, 0, M-1)
+    lo[0], hi[-1] = 0, M-1
+    lo = np.minimum.accumulate(lo[::-1])[::-1]
+    hi = np.maximum.accumulate(hi)
+    # every row must overlap the previous one (a step of at most one column)
+    lo[1:] = np.minimum(lo[1:], hi[:-1] + 1)
+    hi = np.maximum(hi, lo)
+    return lo, hi
+
+def _linear_band(N: int, M: int, slope: float, half_width: int):
+    center = np.arange(N) * slope
+    return _fix_band(np.floor(center).astype(np.int64) - half_width,
+                     np.ceil(center).astype(np.int64) + half_width, M)
+
+def _project_band(wp: np.ndarray, N: int, M: int, radius: int):
+    """Band for the finer level (2x) around a coarse path, widened by `radius` frames."""
+    lo = np.full(N, M, dtype=np.int64)
+    hi = np.full(N, -1, dtype=np.int64)
+    for di in (0, 1):
+        rows = np.minimum(2*wp[:,0] + di, N-1)
+        np.minimum.at(lo, rows, 2*wp[:,1])
+        np.maximum.at(hi, rows, np.minimum(2*wp[:,1] + 1, M-1))
+    # lo is non-decreasing and hi non-decreasing along the path, so a window min/max is a shift
+    lo = np.concatenate([np.full(radius, lo[0]), lo])[:N] - radius
+    hi = np.concatenate([hi, np.full(radius, hi[-1])])[radius:] + radius
+    return _fix_band(lo, hi, M)
+
+def _dtw_band(X: np.ndarray, Y: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Global DTW (steps (1,1), (0,1), (1,0)) restricted to columns lo[i]..hi[i] of each row."""
+    N, M = X.shape[1], Y.shape[1]
+    Xt, Yt = np.ascontiguousarray(X.T), np.ascontiguousarray(Y.T)
+    offsets = np.zeros(N+1, dtype=np.int64)
+    offsets[1:] = np.cumsum(hi - lo + 1)
+    D = np.empty(offsets[-1])
+
+    prev = None
+    for i in range(N):
+        l, h = lo[i], hi[i]
+        c = np.sqrt(np.sum((Yt[l:h+1] - Xt[i])**2, axis=1))
+        cc = np.cumsum(c)
+        if i == 0:
+            d = cc
+        else:
+            # A[j] = min(D[i-1, j-1], D[i-1, j]); inf outside the previous row's band
+            pl, ph = lo[i-1], hi[i-1]
+            p = np.full(h - l + 2, np.inf)        # D[i-1, l-1 .. h]
+            s, e = max(pl, l-1), min(ph, h)
+            if s <= e:
+                p[s-(l-1):e-(l-1)+1] = prev[s-pl:e-pl+1]
+            A = np.minimum(p[:-1], p[1:])
+            # D[j] = c[j] + min(A[j], D[j-1]) unrolled into a running minimum
+            d = cc + np.minimum.accumulate(A - (cc - c))
+        D[offsets[i]:offsets[i+1]] = d
+        prev = d
+
+    def cost(i, j):
+        if i < 0 or j < lo[i] or j > hi[i]:
+            return np.inf
+        return D[offsets[i] + j - lo[i]]
+
+    # Backtrack from the end; ties prefer the diagonal, then (0,1), then (1,0), like librosa.
+    i, j = N-1, M-1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        steps = ((i-1, j-1), (i, j-1), (i-1, j))
+        i, j = min(steps, key=lambda s: cost(*s))
+        path.append((i, j))
+    return np.asarray(path, dtype=np.int64)
+
+def banded_dtw(
+    X: np.ndarray,
+    Y: np.ndarray,
+    slope: Optional[float] = None,
+    band_frac: float = DTW_BAND_FRAC,
+    radius: int = DTW_RADIUS,
+    min_size: int = DTW_MIN_SIZE,
+) -> np.ndarray:
+    """
+    Warping path between X (K, N) and Y (K, M) as an (L, 2) array of (i, j) pairs, end to start.
+    `slope` is the expected dj/di (1/target_ratio); defaults to M/N.
+    """
+    N, M = X.shape[1], Y.shape[1]
+    if min(N, M) > min_size:
+        wp = banded_dtw(_downsample(X), _downsample(Y), slope=slope, band_frac=band_frac,
+                        radius=radius, min_size=min_size)
+        lo, hi = _project_band(wp, N, M, radius)
+    else:
+        slope = M / N if slope is None else slope
+        lo, hi = _linear_band(N, M, slope, max(radius, int(band_frac * M)))
+    return _dtw_band(X, Y, lo, hi)
@@ -10,169 +10,120 @@ This will also produce input_markers.txt with timestamps of skippy points.
 """
 
 import argparse
-from dataclasses import dataclass
-from typing import List, Tuple
+import os
+from typing import Optional, Tuple
 import numpy as np
 import soundfile as sf
+from tempo_cut.skippy import (SkipPlan, frame_energies, plan_file, apply_removals_with_crossfade,
+                              compress_file_streaming, duration_arg, save_plan, plan_sidecar_path,
+                              read_native, output_subtype, STREAM_BLOCK_MS)
+from tempo_cut import metrics
+from tempo_cut.warpmap import WarpMap
 
-@dataclass
-class SkipPlan:
-    removals: List[Tuple[int, int]]
-    achieved_ratio: float
-    removed_ms_total: float
+def report(input_path, output_path, plan, sr, orig_len, new_len, crossfade_ms, target_ratio=None, target_duration=None):
+    achieved = (orig_len / sr) / (new_len / sr)
+    print("Original duration (s):", orig_len/sr)
+    if target_duration is not None:
+        print("Target duration (s):", target_duration)
+        print("Rendered duration (s):", new_len/sr)
+    else:
+        print("Target ratio:", target_ratio)
+    print("Planned achieved ratio:", plan.achieved_ratio)
+    print("Achieved ratio after render:", achieved)
+    print("Removed total (ms):", plan.removed_ms_total)
+    print("Number of removals:", len(plan.removals))
+    print("Wrote:", output_path)
+
+    sidecar = plan_sidecar_path(output_path)
+    save_plan(sidecar, plan, sr, orig_len, crossfade_ms)
+    print(f"[INFO] Skip plan saved for video retime: {sidecar}")
+
+    # Export Premiere Pro marker timestamps
+    # skippy points on the output timeline, through the same warp map as video and subtitles
+    warp = WarpMap.from_plan(plan.removals, orig_len, sr, crossfade_ms)
+    marker_times = warp.to_skip(np.array([start for start,_ in plan.removals], dtype=np.float64) / sr)
+    marker_file = input_path.rsplit(".",1)[0]+"_markers.txt"
+    np.savetxt(marker_file, marker_times, fmt="%.2f")
+    print(f"[INFO] Marker file saved for Premiere: {marker_file}")
+    print(f"[INFO] {len(marker_times)} skippy points written.")
 
-def make_skip_plan(
-    samples: np.ndarray,
-    sr: int,
-    target_ratio: float,
+def compress_file(
+    input_path: str,
+    output_path: str,
+    target_ratio: Optional[float] = None,
+    target_duration: Optional[float] = None,
     frame_ms: float = 20.0,
     max_chop_ms: float = 30.0,
     cadence_ms: float = 300.0,
+    crossfade_ms: float = 8.0,
     energy_quantile: float = 0.4,
-) -> SkipPlan:
-    assert target_ratio >= 1.0, "target_ratio must be >= 1.0 (speed-up)."
-    if target_ratio == 1.0:
-        return SkipPlan(removals=[], achieved_ratio=1.0, removed_ms_total=0.0)
-
-    total_samples = samples.shape[0]
-    duration_s = total_samples / sr
-    remove_s = duration_s * (1.0 - 1.0 / target_ratio)
-    if remove_s <= 0:
-        return SkipPlan(removals=[], achieved_ratio=1.0, removed_ms_total=0.0)
-
-    frame_len = max(1, int(sr * (frame_ms / 1000.0)))
-    max_chop = max(1, int(sr * (max_chop_ms / 1000.0)))
-    cadence = max(1, int(sr * (cadence_ms / 1000.0)))
-
-    n_frames = total_samples // frame_len
-    # Stereo: ensure shape (frames, frame_len, 2)
-    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len, 2) if samples.ndim == 2 else \
-             samples[: n_frames * frame_len].reshape(n_frames, frame_len, 1)
-
-    energies = np.sqrt(np.mean(frames**2, axis=(1,2)) + 1e-12)
-    thresh = np.quantile(energies, energy_quantile)
-    candidate_idxs = np.where(energies <= thresh)[0].tolist()
-
-    remove_samples_total = int(remove_s * sr)
-    removals: List[Tuple[int,int]] = []
-    removed_so_far = 0
-    last_removal_end = -10**12
-    per_chop = min(frame_len, max_chop)
-    checkpoints = list(range(0, total_samples, cadence))
-    cand_set = set(candidate_idxs)
-    search_window = cadence // 2
-
-    def pick_best_candidate_near(start_sample, window_samples):
-        start_frame = max(0, (start_sample - window_samples) // frame_len)
-        end_frame = min(n_frames-1, (start_sample + window_samples) // frame_len)
-        best_idx = None
-        best_energy = 1e9
-        for fi in range(int(start_frame), int(end_frame)+1):
-            if fi in cand_set:
-                e = energies[fi]
-                if e < best_energy:
-                    best_energy = e
-                    best_idx = fi
-        return best_idx
-
-    for cp in checkpoints:
-        if removed_so_far >= remove_samples_total:
-            break
-        fi = pick_best_candidate_near(cp, search_window)
-        if fi is None:
-            continue
-        start = int(fi * frame_len)
-        end = min(int(start + per_chop), total_samples)
-        if start - last_removal_end < cadence:
-            continue
-        if end <= start:
-            continue
-        removals.append((start,end))
-        removed_so_far += (end-start)
-        last_removal_end = end
-
-    achieved_ratio = (total_samples / sr) / ((total_samples - removed_so_far) / sr)
-    return SkipPlan(removals=removals, achieved_ratio=float(achieved_ratio), removed_ms_total=1000.0*removed_so_far/sr)
-
-def apply_removals_with_crossfade(samples: np.ndarray, sr: int, removals: List[Tuple[int,int]], crossfade_ms: float = 8.0) -> np.ndarray:
-    if not removals:
-        return samples
-
-    cross = max(1, int(sr * (crossfade_ms/1000.0)))
-    rem_idx = 0
-    out_chunks = []
-    cursor = 0
-
-    def xfade(a: np.ndarray, b: np.ndarray) -> np.ndarray:
-        n = a.shape[0]
-        t = np.linspace(0,1,n,endpoint=False,dtype=a.dtype)
-        wa, wb = 1.0-t, t
-        return (a*wa[:,None] + b*wb[:,None]) if a.ndim==2 else (a*wa + b*wb)
-
-    while rem_idx < len(removals):
-        start,end = removals[rem_idx]
-        keep_end = max(cursor, start-cross)
-        if keep_end > cursor:
-            out_chunks.append(samples[cursor:keep_end])
-        tail = samples[max(cursor,start-cross):start]
-        head = samples[end:end+cross]
-        if len(tail) and len(head):
-            n = min(len(tail), len(head))
-            out_chunks.append(xfade(tail[-n:], head[:n]))
-            cursor = end+cross
-        else:
-            cursor = end
-        rem_idx +=1
-
-    if cursor < samples.shape[0]:
-        out_chunks.append(samples[cursor:])
-    return np.concatenate(out_chunks, axis=0)
+    stream: bool = False,
+    block_ms: float = STREAM_BLOCK_MS,
+    workers: Optional[int] = None,
+) -> Tuple[SkipPlan, int, int, int]:
+    """
+    Compress input_path into output_path by target_ratio (or to target_duration seconds) and
+    write the plan sidecar and Premiere markers. Returns (plan, sr, orig_len, new_len).
+    `workers` threads plan and render segments in parallel (default: all cores; same output).
+    """
+    if (target_ratio is None) == (target_duration is None):
+        raise ValueError("give exactly one of target_ratio / target_duration")
+    workers = workers or os.cpu_count() or 1
+    if stream:
+        plan, sr, orig_len, new_len = compress_file_streaming(
+            input_path, output_path,
+            target_ratio=target_ratio,
+            frame_ms=frame_ms,
+            max_chop_ms=max_chop_ms,
+            cadence_ms=cadence_ms,
+            crossfade_ms=crossfade_ms,
+            energy_quantile=energy_quantile,
+            block_ms=block_ms,
+            always_2d=True,
+            target_duration=target_duration,
+            workers=workers,
+        )
+    else:
+        with metrics.stage("load"):
+            x,sr,subtype = read_native(input_path, always_2d=True)  # force stereo
+        orig_len = x.shape[0]
+
+        plan = plan_file(input_path, sr, orig_len, lambda frame_len: frame_energies(x, frame_len, workers=workers),
+                         target_ratio=target_ratio, target_duration=target_duration, frame_ms=frame_ms,
+                         max_chop_ms=max_chop_ms, cadence_ms=cadence_ms, crossfade_ms=crossfade_ms,
+                         energy_quantile=energy_quantile, workers=workers)
+
+        with metrics.stage("render"):
+            y = apply_removals_with_crossfade(x, sr, plan.removals, crossfade_ms=crossfade_ms, workers=workers)
+
+        new_len = y.shape[0]
+        with metrics.stage("write"):
+            sf.write(output_path, y, sr, subtype=output_subtype(subtype, output_path))
+    report(input_path, output_path, plan, sr, orig_len, new_len, crossfade_ms,
+           target_ratio=target_ratio, target_duration=target_duration)
+    return plan, sr, orig_len, new_len
 
 def main():
     p = argparse.ArgumentParser(description="Stereo micro-skip audio time compression with Premiere markers.")
     p.add_argument("-i","--input",required=True,help="Input WAV path")
     p.add_argument("-o","--output",required=True,help="Output WAV path")
-    p.add_argument("--target-ratio",type=float,required=True,help="Overall speed-up factor (e.g., 1.02 for 2%% faster)")
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument("--target-ratio",type=float,help="Overall speed-up factor (e.g., 1.02 for 2%% faster)")
+    target.add_argument("--target-duration",type=duration_arg,help="Fit the output to this length, e.g. 21:30.000 (to within one frame)")
     p.add_argument("--frame-ms", type=float, default=20.0)
     p.add_argument("--max-chop-ms", type=float, default=30.0)
     p.add_argument("--cadence-ms", type=float, default=300.0)
     p.add_argument("--crossfade-ms", type=float, default=8.0)
     p.add_argument("--energy-quantile", type=float, default=0.4)
+    p.add_argument("--stream", action="store_true", help="Constant-memory block streaming (same plan and output)")
+    p.add_argument("--block-ms", type=float, default=STREAM_BLOCK_MS, help="Streaming block size in ms")
+    p.add_argument("--workers", type=int, help="Threads for segmented planning/rendering (default: all cores)")
     args = p.parse_args()
 
-    x,sr = sf.read(args.input, always_2d=True)  # force stereo
-    orig_len = x.shape[0]
-
-    plan = make_skip_plan(
-        samples=x,
-        sr=sr,
-        target_ratio=args.target_ratio,
-        frame_ms=args.frame_ms,
-        max_chop_ms=args.max_chop_ms,
-        cadence_ms=args.cadence_ms,
-        energy_quantile=args.energy_quantile
-    )
-
-    y = apply_removals_with_crossfade(x, sr, plan.removals, crossfade_ms=args.crossfade_ms)
-
-    new_len = y.shape[0]
-    achieved = (orig_len / sr) / (new_len / sr)
-    print("Original duration (s):", orig_len/sr)
-    print("Target ratio:", args.target_ratio)
-    print("Planned achieved ratio:", plan.achieved_ratio)
-    print("Achieved ratio after render:", achieved)
-    print("Removed total (ms):", plan.removed_ms_total)
-    print("Number of removals:", len(plan.removals))
-
-    sf.write(args.output, y, sr)
-    print("Wrote:", args.output)
-
-    # Export Premiere Pro marker timestamps
-    marker_times = [start/sr for start,_ in plan.removals]
-    marker_file = args.input.rsplit(".",1)[0]+"_markers.txt"
-    np.savetxt(marker_file, marker_times, fmt="%.2f")
-    print(f"[INFO] Marker file saved for Premiere: {marker_file}")
-    print(f"[INFO] {len(marker_times)} skippy points written.")
+    compress_file(args.input, args.output, target_ratio=args.target_ratio, target_duration=args.target_duration,
+                  frame_ms=args.frame_ms, max_chop_ms=args.max_chop_ms, cadence_ms=args.cadence_ms,
+                  crossfade_ms=args.crossfade_ms, energy_quantile=args.energy_quantile,
+                  stream=args.stream, block_ms=args.block_ms, workers=args.workers)
 
 if __name__=="__main__":
     main()
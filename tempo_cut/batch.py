@@ -0,0 +1,249 @@
+"""
+batch.py  —  Season/episode batch runner for `tempocut batch`.
+
+Takes a JSON manifest or a directory of episodes and runs the audio, video and
+subs stages for each one across a process pool. A stage is only started
+while the estimated cores and memory of everything running stay inside the
+configured limits. Progress is kept in a JSON job-state file that is rewritten
+after every stage, so an interrupted run resumes at each episode's first
+unfinished stage.
+"""
+
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from tempo_cut import metrics
+from tempo_cut.warpmap import MAP_FILENAME
+
+STAGES       = ("audio", "video", "subs")
+STAGE_CORES  = {"audio": 1, "video": 4, "subs": 1}          # estimated cores per stage
+STAGE_MEM_GB = {"audio": 0.5, "video": 2.0, "subs": 0.1}    # estimated peak RAM per stage
+VIDEO_EXTS   = (".mp4", ".mkv", ".mov", ".m4v", ".ts")
+STATE_FILE   = "tempocut_batch_state.json"
+STAGE_OUTPUTS = {"audio": ("skippy", "plan"), "video": ("map", "video"), "subs": ("srt",)}
+AUDIO_OPTS   = ("frame_ms", "max_chop_ms", "cadence_ms", "crossfade_ms", "energy_quantile")
+
+# ---------- Episodes ----------
+
+def load_episodes(source, defaults):
+    """Episodes from a JSON manifest or a directory of <name>.<video> + <name>.wav (+ <name>.srt)."""
+    if os.path.isdir(source):
+        episodes = []
+        for fn in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(fn)
+            if ext.lower() not in VIDEO_EXTS:
+                continue
+            wav = os.path.join(source, stem + ".wav")
+            if not os.path.exists(wav):
+                print(f"WARN: {fn}: no {stem}.wav next to it; skipping")
+                continue
+            srt = os.path.join(source, stem + ".srt")
+            episodes.append({"name": stem, "video": os.path.join(source, fn), "audio": wav,
+                             "srt": srt if os.path.exists(srt) else None})
+    else:
+        with open(source, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            defaults = {**defaults, **manifest.get("defaults", {})}
+            manifest = manifest["episodes"]
+        base = os.path.dirname(os.path.abspath(source))
+        episodes = []
+        for ep in manifest:
+            ep = dict(ep)
+            for key in ("video", "audio", "srt"):
+                if ep.get(key):
+                    ep[key] = os.path.join(base, ep[key])
+            ep.setdefault("name", os.path.splitext(os.path.basename(ep["video"]))[0])
+            episodes.append(ep)
+
+    episodes = [{**defaults, **ep} for ep in episodes]
+    for ep in episodes:
+        if ep.get("target_ratio") is None and ep.get("target_duration") is None:
+            raise ValueError(f"{ep['name']}: no target_ratio or target_duration "
+                             "(set it per episode, in manifest defaults or with --target-ratio)")
+    names = [ep["name"] for ep in episodes]
+    if len(set(names)) != len(names):
+        raise ValueError("episode names must be unique (they name the output folders)")
+    return episodes
+
+def episode_paths(ep, out_dir):
+    work = os.path.join(out_dir, ep["name"])
+    return {
+        "work":   work,
+        "skippy": os.path.join(work, ep["name"] + "_skippy.wav"),
+        "plan":   os.path.join(work, ep["name"] + "_skippy_plan.npz"),
+        "map":    os.path.join(work, MAP_FILENAME),
+        "video":  os.path.join(work, ep["name"] + ".mp4"),
+        "srt":    os.path.join(work, ep["name"] + ".srt"),
+    }
+
+def run_stage(stage, ep, paths):
+    """Run one stage in this process; raises on failure."""
+    if stage == "audio":
+        if ep.get("stereo"):
+            from tempo_cut.audio_stereo import compress_file
+        else:
+            from tempo_cut.audio_surround import compress_file
+        from tempo_cut.skippy import parse_duration
+        opts = {opt: ep[opt] for opt in AUDIO_OPTS if ep.get(opt) is not None}
+        if ep.get("target_duration") is not None:
+            opts["target_duration"] = parse_duration(str(ep["target_duration"]))
+        else:
+            opts["target_ratio"] = float(ep["target_ratio"])
+        compress_file(ep["audio"], paths["skippy"], stream=ep.get("stream", True),
+                      workers=STAGE_CORES["audio"], **opts)
+    elif stage == "video":
+        # rendered straight into the final file, with the skippy audio encoded once
+        from tempo_cut.ffio import EncoderSettings, FINAL_AUDIO_BITRATE
+        from tempo_cut.video import time_compress_video
+        time_compress_video(ep["video"], paths["skippy"], paths["video"], plan_path=paths["plan"],
+                            encoder=EncoderSettings(audio_bitrate=FINAL_AUDIO_BITRATE),
+                            workers=STAGE_CORES["video"])
+    elif stage == "subs":
+        from tempo_cut.subs import retime_subs
+        retime_subs(paths["map"], ep["srt"], paths["srt"])
+    else:
+        raise ValueError(f"unknown stage {stage!r}")
+
+def _run_stage(stage, ep, paths, log_path, collect_metrics=False):
+    """
+    Worker-process entry point: run one stage with stdout/stderr redirected to its log.
+    The redirect is at the file-descriptor level so ffmpeg's output lands there too.
+    Returns (0 on success or 1 on failure with the traceback in the log, metrics report or None).
+    """
+    if collect_metrics:
+        metrics.enable()
+    with open(log_path, "a", encoding="utf-8") as log:
+        log.write(f"\n=== {datetime.now().isoformat(timespec='seconds')} > {stage} {ep['name']}\n")
+        log.flush()
+        sys.stdout.flush(); sys.stderr.flush()
+        saved = os.dup(1), os.dup(2)
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            run_stage(stage, ep, paths)
+            ret = 0
+        except Exception:
+            traceback.print_exc()
+            ret = 1
+        finally:
+            sys.stdout.flush(); sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+    return ret, metrics.report(stage=stage, episode=ep["name"]) if collect_metrics else None
+
+# ---------- Job state ----------
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"episodes": {}}
+
+def save_state(state, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def next_stage(ep, est, paths):
+    """First stage that is not done, or whose outputs have gone missing since."""
+    def done(stage):
+        return (est.get(stage, {}).get("status") == "done" and
+                all(os.path.exists(paths[key]) for key in STAGE_OUTPUTS[stage]))
+    for stage in STAGES:
+        if stage == "subs" and not ep.get("srt"):
+            continue
+        if not done(stage):
+            return stage
+    return None
+
+# ---------- Scheduler ----------
+
+def run_batch(episodes, out_dir, state_path=None, max_cores=None, max_mem_gb=None, retry_failed=False,
+              collect_metrics=False):
+    """
+    Run every episode to completion. Returns the number of episodes with a failed stage.
+    With collect_metrics, each stage's metrics report is attached as "<episode>/<stage>".
+    """
+    max_cores = max_cores or os.cpu_count() or 1
+    state_path = state_path or os.path.join(out_dir, STATE_FILE)
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_state(state_path)
+    for ep in episodes:
+        est = state["episodes"].setdefault(ep["name"], {})
+        for stage, info in est.items():
+            if info.get("status") == "running" or (retry_failed and info.get("status") == "failed"):
+                info["status"] = "pending"
+        os.makedirs(episode_paths(ep, out_dir)["work"], exist_ok=True)
+    save_state(state, state_path)
+
+    def blocked(ep):
+        est = state["episodes"][ep["name"]]
+        return any(info.get("status") == "failed" for info in est.values())
+
+    running = {}   # future -> (episode, stage)
+    busy = set()
+    used_cores, used_mem = 0, 0.0
+    with ProcessPoolExecutor(max_workers=max_cores) as pool:
+        while True:
+            for ep in episodes:
+                if ep["name"] in busy or blocked(ep):
+                    continue
+                est = state["episodes"][ep["name"]]
+                paths = episode_paths(ep, out_dir)
+                stage = next_stage(ep, est, paths)
+                if stage is None:
+                    continue
+                cores = min(STAGE_CORES[stage], max_cores)
+                mem = STAGE_MEM_GB[stage]
+                # Always let one stage run, even if its estimate alone exceeds the limits.
+                if running and (used_cores + cores > max_cores or
+                                (max_mem_gb and used_mem + mem > max_mem_gb)):
+                    continue
+                log = os.path.join(paths["work"], stage + ".log")
+                print(f"▶ {ep['name']}: {stage}")
+                running[pool.submit(_run_stage, stage, ep, paths, log, collect_metrics)] = (ep, stage)
+                busy.add(ep["name"])
+                used_cores += cores
+                used_mem += mem
+                est[stage] = {"status": "running", "started": datetime.now().isoformat(timespec="seconds")}
+            save_state(state, state_path)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                ep, stage = running.pop(fut)
+                busy.discard(ep["name"])
+                used_cores -= min(STAGE_CORES[stage], max_cores)
+                used_mem -= STAGE_MEM_GB[stage]
+                try:
+                    ret, stage_metrics = fut.result()
+                except Exception as e:
+                    ret, err = -1, repr(e)
+                else:
+                    err = None
+                    if stage_metrics:
+                        metrics.add_child(f"{ep['name']}/{stage}", stage_metrics)
+                metrics.count("stages_done" if ret == 0 else "stages_failed")
+                info = state["episodes"][ep["name"]][stage]
+                info["finished"] = datetime.now().isoformat(timespec="seconds")
+                if ret == 0:
+                    info["status"] = "done"
+                    print(f"✅ {ep['name']}: {stage}")
+                else:
+                    info["status"] = "failed"
+                    info["returncode"] = ret
+                    if err:
+                        info["error"] = err
+                    print(f"❌ {ep['name']}: {stage} failed ({ret}); see {stage}.log")
+                save_state(state, state_path)
+
+    return sum(1 for ep in episodes if blocked(ep))
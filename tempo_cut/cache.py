@@ -0,0 +1,141 @@
+"""
+cache.py  —  Content-addressed on-disk cache for analysis results.
+
+Mel features, frame energies, DTW paths and skip plans are stored as one .npz per
+entry, keyed by a hash of the input files' contents plus every parameter that
+affects the result, so rerunning an unchanged stage (while tuning other knobs) is a
+cache hit. File hashes are remembered by (path, size, mtime) so a rerun doesn't
+re-read multi-GB inputs. Entries are evicted least-recently-used once the folder
+grows past CACHE_MAX_MB.
+
+Set TEMPOCUT_CACHE_DIR to move the cache, TEMPOCUT_CACHE_MB=0 to turn it off.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from typing import Dict, Optional
+import numpy as np
+from tempo_cut import metrics
+
+# ---------- Tunables ----------
+CACHE_DIR    = os.environ.get("TEMPOCUT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "tempocut"))
+CACHE_MAX_MB = float(os.environ.get("TEMPOCUT_CACHE_MB", 2048))   # 0 disables the cache
+HASH_CHUNK   = 1 << 22
+DIGESTS_FILE = "digests.json"
+# ------------------------------
+
+def enabled() -> bool:
+    return CACHE_MAX_MB > 0
+
+# ---------- Keys ----------
+
+def _load_digests() -> Dict[str, list]:
+    try:
+        with open(os.path.join(CACHE_DIR, DIGESTS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _atomic_write(path: str, write) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+def file_digest(path: str) -> str:
+    """Content hash of a file, memoized on (realpath, size, mtime_ns)."""
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    stamp = [st.st_size, st.st_mtime_ns]
+    digests = _load_digests() if enabled() else {}
+    hit = digests.get(real)
+    if hit and hit[:2] == stamp:
+        return hit[2]
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(real, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    if enabled():
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        digests = _load_digests()   # re-read: another job may have added entries meanwhile
+        digests[real] = stamp + [digest]
+        _atomic_write(os.path.join(CACHE_DIR, DIGESTS_FILE),
+                      lambda f: f.write(json.dumps(digests).encode("utf-8")))
+    return digest
+
+def make_key(kind: str, inputs, **params) -> str:
+    """Key for a `kind` of result computed from the files in `inputs` with `params`."""
+    blob = json.dumps({"kind": kind, "inputs": [file_digest(p) for p in inputs], "params": params},
+                      sort_keys=True, default=float)
+    return kind + "-" + hashlib.blake2b(blob.encode("utf-8"), digest_size=16).hexdigest()
+
+# ---------- Entries ----------
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key + ".npz")
+
+def get(key: str) -> Optional[Dict[str, np.ndarray]]:
+    """Arrays stored under `key`, or None. A hit marks the entry as recently used."""
+    if not enabled():
+        return None
+    path = _entry_path(key)
+    try:
+        with np.load(path) as z:
+            arrays = {name: z[name] for name in z.files}
+    except OSError:
+        metrics.count("cache_misses")
+        return None
+    except (ValueError, EOFError, KeyError, zipfile.BadZipFile):
+        # truncated or corrupt entry (e.g. a killed writer on a filesystem without atomic rename): drop it
+        try: os.remove(path)
+        except OSError: pass
+        metrics.count("cache_misses")
+        return None
+    metrics.count("cache_hits")
+    try: os.utime(path)
+    except OSError: pass
+    return arrays
+
+def put(key: str, **arrays) -> None:
+    if not enabled():
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _atomic_write(_entry_path(key), lambda f: np.savez(f, **arrays))
+    evict()
+
+def evict(max_mb: Optional[float] = None) -> int:
+    """Delete least-recently-used entries until the cache fits. Returns the number removed."""
+    limit = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".npz")]
+    except OSError:
+        return 0
+    stats = []
+    for e in entries:
+        try:
+            st = e.stat()
+        except OSError:
+            continue
+        stats.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in stats)
+    removed = 0
+    for _, size, path in sorted(stats):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -1,110 +1,243 @@
 import argparse, subprocess, sys, shutil, os
+from tempo_cut import metrics
 
-HERE = os.path.dirname(__file__)
-ROOT = os.path.abspath(os.path.join(HERE, ".."))
-PY = shutil.which("python") or sys.executable
+# Stage modules (numpy, soundfile, librosa, moviepy, ...) are imported inside each
+# command so a subcommand only pays for what it uses.
+
+AUDIO_OPTS = ("frame_ms", "max_chop_ms", "cadence_ms", "crossfade_ms", "energy_quantile", "block_ms", "workers")
+LIVE_OPTS = ("frame_ms", "max_chop_ms", "cadence_ms", "crossfade_ms", "energy_quantile", "block_ms")
+ENCODER_OPTS = ("codec", "preset", "crf", "bitrate", "threads", "audio_bitrate")
 
 def run(cmd):
     print("> " + " ".join(cmd))
     return subprocess.call(cmd)
 
 def cmd_audio(args):
-    script = os.path.join(ROOT, "tempo_cut", "audio_stereo.py" if args.stereo else "audio_surround.py")
-    cmd = [PY, script, "-i", args.input, "-o", args.output, "--target-ratio", str(args.target_ratio)]
-    if args.frame_ms is not None:        cmd += ["--frame-ms", str(args.frame_ms)]
-    if args.max_chop_ms is not None:     cmd += ["--max-chop-ms", str(args.max_chop_ms)]
-    if args.cadence_ms is not None:      cmd += ["--cadence-ms", str(args.cadence_ms)]
-    if args.crossfade_ms is not None:    cmd += ["--crossfade-ms", str(args.crossfade_ms)]
-    if args.energy_quantile is not None: cmd += ["--energy-quantile", str(args.energy_quantile)]
-    sys.exit(run(cmd))
+    if args.live:
+        from tempo_cut.live import run_live
+        if args.target_ratio is None:
+            print("ERROR: --live needs --target-ratio (a stream has no length to fit)", file=sys.stderr)
+            sys.exit(2)
+        opts = {opt: getattr(args, opt) for opt in LIVE_OPTS if getattr(args, opt) is not None}
+        run_live(args.target_ratio, sr=args.sample_rate, channels=args.channels, pcm_format=args.pcm_format, **opts)
+        return
+    if not args.input or not args.output:
+        print("ERROR: -i/--input and -o/--output are required (or use --live)", file=sys.stderr)
+        sys.exit(2)
+    if args.stereo:
+        from tempo_cut.audio_stereo import compress_file
+    else:
+        from tempo_cut.audio_surround import compress_file
+    opts = {opt: getattr(args, opt) for opt in AUDIO_OPTS if getattr(args, opt) is not None}
+    if args.target_duration is not None:
+        opts["target_duration"] = args.target_duration
+    else:
+        opts["target_ratio"] = args.target_ratio
+    compress_file(args.input, args.output, stream=args.stream, **opts)
+
+def duration_arg(text):
+    from tempo_cut.skippy import duration_arg
+    return duration_arg(text)
+
+def encoder_settings(args):
+    from tempo_cut.ffio import EncoderSettings
+    return EncoderSettings(**{opt: getattr(args, opt) for opt in ENCODER_OPTS if getattr(args, opt) is not None})
 
 def cmd_video(args):
-    script = os.path.join(ROOT, "tempo_cut", "video.py")
-    cmd = [PY, script, "-i", args.input_video, "-s", args.input_audio, "-o", args.output]
-    sys.exit(run(cmd))
+    from tempo_cut.video import time_compress_video, DTW_ALIGNER, RENDER_MODE, CHECKPOINT_FRAMES
+    time_compress_video(args.input_video, args.input_audio, args.output, plan_path=args.plan,
+                        aligner=args.aligner or DTW_ALIGNER, encoder=encoder_settings(args), workers=args.workers,
+                        render=args.render or RENDER_MODE, segments=args.segments,
+                        checkpoint_frames=CHECKPOINT_FRAMES if args.checkpoint_frames is None else args.checkpoint_frames)
 
 def cmd_subs(args):
-    script = os.path.join(ROOT, "tempo_cut", "subs.py")
-    cmd = [PY, script, args.map, args.input_srt, args.output_srt]
-    sys.exit(run(cmd))
-
-def cmd_pipeline(args):
-    # 1) video retime
-    ret = run([PY, os.path.join(ROOT, "tempo_cut", "video.py"),
-               "-i", args.input_video, "-s", args.input_audio, "-o", args.temp_out])
-    if ret:
-        sys.exit(ret)
-
-    # 2) mux with ffmpeg
-    ffmpeg = shutil.which("ffmpeg")
-    if not ffmpeg:
-        print("ERROR: ffmpeg not found in PATH")
+    from tempo_cut.subs import collect_tracks, retime_many
+    if args.out_dir:
+        pairs = collect_tracks(args.paths, args.out_dir)
+    elif len(args.paths) == 2:
+        pairs = [tuple(args.paths)]
+    else:
+        print("ERROR: give <input> <output>, or any number of inputs with -o/--out-dir")
+        sys.exit(2)
+    with metrics.stage("subs"):
+        results = retime_many(args.map, pairs, jobs=args.jobs, fps=args.fps)
+    failed = [(src, err) for src, _, err in results if err]
+    cues = sum(n for _, n, _ in results)
+    metrics.count("tracks", len(results) - len(failed))
+    metrics.count("tracks_failed", len(failed))
+    metrics.count("cues", cues)
+    for src, err in failed:
+        print(f"❌ {src}: {err}")
+    if len(pairs) == 1 and not failed:
+        print(f"✅ Subtitles retimed and saved to {pairs[0][1]}")
+    else:
+        print(f"✅ Retimed {len(results) - len(failed)} of {len(results)} tracks ({cues} cues)")
+    if failed:
         sys.exit(1)
-    ret = run([ffmpeg, "-y", "-i", args.temp_out, "-i", args.input_audio,
-               "-map", "0:v", "-map", "1:a", "-c:v", "copy", "-c:a", "aac", "-b:a", "512k", args.output_video])
-    if ret:
-        sys.exit(ret)
 
-    # 3) subtitle retime (optional)
+def cmd_pipeline(args):
+    if args.temp_out is not None:
+        print("WARN: --temp-out is deprecated and ignored (the video is rendered straight into "
+              "--output-video); it will be removed in a later release")
+    from tempo_cut.skippy import plan_sidecar_path
+    from tempo_cut.video import time_compress_video, RENDER_MODE, CHECKPOINT_FRAMES
+    from tempo_cut.warpmap import MAP_FILENAME
+    from tempo_cut.ffio import FINAL_AUDIO_BITRATE
+    if args.audio_bitrate is None:
+        args.audio_bitrate = FINAL_AUDIO_BITRATE
+    # 1) video retime straight into the final file; the skippy WAV is encoded once as its audio
+    #    (exact map from the audio engine's skip plan when available)
+    plan = args.plan or plan_sidecar_path(args.input_audio)
+    time_compress_video(args.input_video, args.input_audio, args.output_video,
+                        plan_path=plan if os.path.exists(plan) else None,
+                        encoder=encoder_settings(args), workers=args.workers, render=args.render or RENDER_MODE,
+                        segments=args.segments,
+                        checkpoint_frames=CHECKPOINT_FRAMES if args.checkpoint_frames is None else args.checkpoint_frames)
+
+    # 2) subtitle retime (optional)
     if args.input_srt and os.path.exists(args.input_srt):
-        map_file = "map_t_skip_to_t_orig.npy"
+        map_file = os.path.join(os.path.dirname(args.output_video), MAP_FILENAME)
         if os.path.exists(map_file):
-            ret = run([PY, os.path.join(ROOT, "tempo_cut", "subs.py"),
-                       map_file, args.input_srt, args.output_srt])
-            if ret:
+            from tempo_cut.subs import retime_subs
+            try:
+                retime_subs(map_file, args.input_srt, args.output_srt)
+            except Exception as e:
+                print(f"WARN: subtitle retime failed ({e})")
                 ffsubsync = shutil.which("ffsubsync")
                 if ffsubsync:
                     run([ffsubsync, args.output_video, "--sub", args.input_srt, "-o", args.output_srt])
         else:
             print("WARN: map file not found; skipping subtitle retime")
-    # 4) cleanup
-    try:
-        os.remove(args.temp_out)
-    except OSError:
-        pass
+
+def cmd_batch(args):
+    from tempo_cut.batch import load_episodes, run_batch
+    defaults = {"target_ratio": args.target_ratio, "stereo": args.stereo}
+    episodes = load_episodes(args.source, {k: v for k, v in defaults.items() if v is not None})
+    failed = run_batch(episodes, args.out, state_path=args.state, max_cores=args.cores,
+                       max_mem_gb=args.max_memory_gb, retry_failed=args.retry_failed,
+                       collect_metrics=metrics.enabled())
+    sys.exit(1 if failed else 0)
+
+def add_encoder_options(parser, final_file=False):
+    parser.add_argument("--codec", help="ffmpeg video encoder (default libx264)")
+    parser.add_argument("--preset", help="encoder preset (default fast)")
+    parser.add_argument("--crf", type=float, help="constant quality (overrides --bitrate)")
+    parser.add_argument("--bitrate", help="video bitrate, e.g. 12M")
+    parser.add_argument("--threads", type=int, help="encoder threads (0 = auto)")
+    parser.add_argument("--audio-bitrate",
+                        help="audio bitrate, e.g. 512k" + (" (default ffio.FINAL_AUDIO_BITRATE)" if final_file else ""))
+    parser.add_argument("--workers", type=int, help="frame blending threads (default: all cores)")
+    parser.add_argument("--render", choices=["python","ffmpeg"],
+                        help="python (default): frames blended in numpy; ffmpeg: schedule compiled to a filtergraph")
+    parser.add_argument("--segments", type=int, default=1,
+                        help="render this many slices of the output in parallel processes, then concat")
+    parser.add_argument("--checkpoint-frames", type=int,
+                        help="outputs longer than this many frames (default 18000, ~5 min) render in resumable "
+                             "pieces joined by a stream-copy concat instead of one pass; 0 = single pass")
+
+def add_metrics_option(parser):
+    parser.add_argument("--metrics", metavar="OUT_JSON",
+                        help="Write per-stage wall/CPU time, peak RSS and counters to this JSON file")
 
 def build_parser():
     p = argparse.ArgumentParser(prog="tempocut", description="Broadcast-style A/V time compression")
+    p.add_argument("--cache-dir", help="Analysis cache folder (default ~/.cache/tempocut or $TEMPOCUT_CACHE_DIR)")
+    p.add_argument("--cache-mb", type=float, help="Analysis cache size limit in MB, LRU-evicted (0 disables)")
+    p.add_argument("--no-cache", action="store_true", help="Don't read or write the analysis cache")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     a = sub.add_parser("audio", help="Time compress audio (skippy)")
-    a.add_argument("-i","--input", required=True)
-    a.add_argument("-o","--output", required=True)
-    a.add_argument("--target-ratio", type=float, required=True)
+    a.add_argument("-i","--input", help="Input audio file (required unless --live)")
+    a.add_argument("-o","--output", help="Output audio file (required unless --live)")
+    target = a.add_mutually_exclusive_group(required=True)
+    target.add_argument("--target-ratio", type=float)
+    target.add_argument("--target-duration", type=duration_arg, help="Fit the output to a length, e.g. 21:30.000")
     a.add_argument("--stereo", action="store_true", help="Use stereo engine (default is surround)")
     a.add_argument("--frame-ms", type=float)
     a.add_argument("--max-chop-ms", type=float)
     a.add_argument("--cadence-ms", type=float)
     a.add_argument("--crossfade-ms", type=float)
     a.add_argument("--energy-quantile", type=float)
+    a.add_argument("--stream", action="store_true", help="Constant-memory block streaming mode")
+    a.add_argument("--block-ms", type=float, help="Streaming block size in ms")
+    a.add_argument("--workers", type=int, help="Threads for segmented planning/rendering (default: all cores)")
+    a.add_argument("--live", action="store_true", help="Compress raw PCM from stdin to stdout with bounded latency")
+    a.add_argument("--sample-rate", type=int, default=48000, help="Live input sample rate (default 48000)")
+    a.add_argument("--channels", type=int, default=2, help="Live input channels (default 2)")
+    a.add_argument("--pcm-format", choices=("s16le", "s32le", "f32le"), default="s16le", help="Live sample format")
+    add_metrics_option(a)
     a.set_defaults(func=cmd_audio)
 
     v = sub.add_parser("video", help="Retime video to skippy audio (59.94p)")
     v.add_argument("-i","--input-video", required=True)
     v.add_argument("-s","--input-audio", required=True)
     v.add_argument("-o","--output", required=True)
+    v.add_argument("-p","--plan", help="Skip plan sidecar from the audio engine (bypasses DTW)")
+    v.add_argument("--aligner", choices=["banded","full"], help="DTW engine when no plan is given")
+    add_encoder_options(v)
+    add_metrics_option(v)
     v.set_defaults(func=cmd_video)
 
-    s = sub.add_parser("subs", help="Retime SRT using warp map")
+    s = sub.add_parser("subs", help="Retime SRT/VTT/ASS subtitles using warp map")
     s.add_argument("map")
-    s.add_argument("input_srt")
-    s.add_argument("output_srt")
+    s.add_argument("paths", nargs="+", metavar="path",
+                   help="<input> <output>, or with -o any number of subtitle files and folders")
+    s.add_argument("-o","--out-dir", help="Write every retimed track here (folders keep their layout)")
+    s.add_argument("-j","--jobs", type=int, help="Worker processes for many tracks (default: all cores)")
+    s.add_argument("--fps", type=float, help="Frame rate for frame-based formats read through pysubs2")
+    add_metrics_option(s)
     s.set_defaults(func=cmd_subs)
 
-    pl = sub.add_parser("pipeline", help="One-shot: video retime + mux + subs")
+    pl = sub.add_parser("pipeline", help="One-shot: video retime with muxed audio + subs")
     pl.add_argument("--input-video", default="input.mp4")
     pl.add_argument("--input-audio", default="input.wav")
     pl.add_argument("--input-srt", default="input.srt")
-    pl.add_argument("--temp-out", default="output_temp.mp4")
+    pl.add_argument("--plan", help="Skip plan sidecar (default: <input-audio>_plan.npz if present)")
     pl.add_argument("--output-video", default="output_final.mp4")
     pl.add_argument("--output-srt", default="output_final.srt")
+    pl.add_argument("--temp-out", help=argparse.SUPPRESS)   # deprecated: ignored, remove in a later release
+    add_encoder_options(pl, final_file=True)
+    add_metrics_option(pl)
     pl.set_defaults(func=cmd_pipeline)
 
+    b = sub.add_parser("batch", help="Run audio/video/subs for many episodes with resume")
+    b.add_argument("source", help="JSON manifest, or a folder of <name>.mp4 + <name>.wav (+ <name>.srt)")
+    b.add_argument("-o","--out", default="tempocut_out", help="Output root; one folder per episode")
+    b.add_argument("--target-ratio", type=float, help="Default target ratio for episodes that don't set one")
+    b.add_argument("--stereo", action="store_true", default=None, help="Use the stereo audio engine")
+    b.add_argument("--cores", type=int, help="Core budget for concurrent stages (default: all)")
+    b.add_argument("--max-memory-gb", type=float, help="Memory budget for concurrent stages")
+    b.add_argument("--state", help="Job-state file (default: <out>/tempocut_batch_state.json)")
+    b.add_argument("--retry-failed", action="store_true", help="Retry stages that failed in a previous run")
+    add_metrics_option(b)
+    b.set_defaults(func=cmd_batch)
+
     return p
 
 def main(argv=None):
     args = build_parser().parse_args(argv)
-    args.func(args)
+    # through the environment so batch worker processes see it too
+    if args.cache_dir:
+        os.environ["TEMPOCUT_CACHE_DIR"] = args.cache_dir
+    if args.no_cache:
+        os.environ["TEMPOCUT_CACHE_MB"] = "0"
+    elif args.cache_mb is not None:
+        os.environ["TEMPOCUT_CACHE_MB"] = str(args.cache_mb)
+    if not args.metrics:
+        args.func(args)
+        return
+    metrics.enable()
+    status = "failed"
+    try:
+        args.func(args)
+        status = "ok"
+    except SystemExit as e:
+        status = "ok" if not e.code else "failed"
+        raise
+    finally:
+        metrics.write(args.metrics, command=args.cmd, status=status)
+        # stdout carries the audio in --live mode
+        print(f"[INFO] Metrics written: {args.metrics}", file=sys.stderr if getattr(args, "live", False) else sys.stdout)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,316 @@
+"""
+ffio.py  —  Direct ffmpeg pipe I/O for the video stage.
+
+FrameReader decodes source frames sequentially from an ffmpeg rawvideo pipe on a
+prefetch thread and keeps the most recent ones in a bounded LRU cache keyed by
+frame index. The retimer asks for frames in (mostly) increasing order, so every
+source frame is decoded exactly once and nothing is ever re-seeked.
+
+FrameWriter is the matching sink: RGB24 frames go straight into an ffmpeg stdin
+pipe, optionally muxed with an audio file, using configurable EncoderSettings.
+
+read_audio decodes a file's audio track through a pipe as mono float32 at a given
+rate, for analysis that shouldn't round-trip through a temp WAV.
+
+render_filtergraph runs a whole render as one ffmpeg process: decode, a filtergraph
+script, encode and mux, reporting progress as it goes. concat_files joins separately
+encoded pieces without re-encoding them.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import List, Optional
+import numpy as np
+
+FRAME_PREFETCH = 16   # decoded frames queued ahead of the consumer
+FINAL_AUDIO_BITRATE = "512k"   # pipeline/batch: AAC bitrate of the final file
+
+def ffmpeg_binary():
+    """The ffmpeg moviepy is configured with, falling back to PATH."""
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except ImportError:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+def read_audio(path, sr, ffmpeg=None):
+    """First audio stream of `path` downmixed to mono and resampled to `sr`, as a float32 array."""
+    cmd = [ffmpeg or ffmpeg_binary(), "-v", "error", "-i", path, "-map", "0:a:0", "-vn", "-sn",
+           "-ac", "1", "-ar", str(int(sr)), "-f", "f32le", "-"]
+    proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise IOError(f"ffmpeg failed decoding audio from {path}:\n{proc.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(proc.stdout, dtype="<f4")
+
+class FrameReader:
+    """
+    Sequential RGB24 frame source with an LRU cache.
+
+    get(idx) returns frame `idx` as a read-only (h, w, 3) uint8 array. Requests at or
+    ahead of the decode position are served by reading forward; requests behind it hit
+    the cache, and only a miss older than the cache restarts the decoder at `idx`.
+    """
+
+    def __init__(self, path, size, fps, cache_size=48, prefetch=FRAME_PREFETCH, start_index=0, ffmpeg=None):
+        self.path = path
+        self.w, self.h = int(size[0]), int(size[1])
+        self.fps = float(fps)
+        self.cache_size = max(2, int(cache_size))
+        self.prefetch = max(1, int(prefetch))
+        self.ffmpeg = ffmpeg or ffmpeg_binary()
+        self.cache = OrderedDict()
+        self.frames_decoded = 0
+        self.restarts = 0
+        self._last = None         # most recently decoded frame, held past the end of the stream
+        self._proc = None
+        self._thread = None
+        self._start(start_index)
+
+    # ---------- decoder ----------
+    def _start(self, index):
+        cmd = [self.ffmpeg, "-v", "error"]
+        if index > 0:
+            # half a frame early so pts rounding can't skip the frame we want
+            cmd += ["-ss", f"{(index - 0.5) / self.fps:.6f}"]
+        cmd += ["-i", self.path, "-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                "-s", f"{self.w}x{self.h}", "-an", "-sn", "-"]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                      bufsize=self.w*self.h*3*2)
+        self._queue = queue.Queue(maxsize=self.prefetch)
+        self._stop = threading.Event()
+        self._next = index        # index of the next frame the queue will yield
+        self._eof = False
+        self._thread = threading.Thread(target=self._decode, args=(self._proc, self._queue, self._stop), daemon=True)
+        self._thread.start()
+
+    def _decode(self, proc, q, stop):
+        nbytes = self.w*self.h*3
+        while not stop.is_set():
+            buf = proc.stdout.read(nbytes)
+            if len(buf) < nbytes:
+                break
+            frame = np.frombuffer(buf, dtype=np.uint8).reshape(self.h, self.w, 3)
+            while not stop.is_set():
+                try:
+                    q.put(frame, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+        while not stop.is_set():
+            try:
+                q.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+    def _shutdown(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        try:
+            self._proc.kill()
+        except OSError:
+            pass
+        self._thread.join()
+        self._proc.stdout.close()
+        self._proc.wait()
+        self._thread = None
+
+    def _restart(self, index):
+        self._shutdown()
+        self.restarts += 1
+        self._start(index)
+
+    # ---------- cache ----------
+    def _remember(self, idx, frame):
+        self.cache[idx] = frame
+        self.cache.move_to_end(idx)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def get(self, idx):
+        idx = max(0, int(idx))
+        frame = self.cache.get(idx)
+        if frame is not None:
+            self.cache.move_to_end(idx)
+            return frame
+        if idx < self._next:
+            self._restart(idx)
+        while self._next <= idx and not self._eof:
+            frame = self._queue.get()
+            if frame is None:
+                self._eof = True
+                break
+            self.frames_decoded += 1
+            self._remember(self._next, frame)
+            self._last = frame
+            self._next += 1
+        if idx in self.cache:
+            return self.cache[idx]
+        if self._last is None:
+            raise IndexError(f"{self.path}: no frame {idx} (stream has no decodable frames)")
+        return self._last
+
+    def close(self):
+        self._shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@dataclass
+class EncoderSettings:
+    codec: str = "libx264"
+    preset: Optional[str] = "fast"
+    threads: int = 0                  # 0 = let the encoder use every core
+    crf: Optional[float] = None
+    bitrate: Optional[str] = None     # e.g. "12M"; ignored when crf is set
+    pix_fmt: str = "yuv420p"
+    audio_codec: str = "aac"
+    audio_bitrate: Optional[str] = None
+    extra_args: List[str] = field(default_factory=list)
+
+    def video_args(self):
+        args = ["-c:v", self.codec, "-pix_fmt", self.pix_fmt, "-threads", str(self.threads)]
+        if self.preset:
+            args += ["-preset", self.preset]
+        if self.crf is not None:
+            args += ["-crf", f"{self.crf:g}"]
+        elif self.bitrate:
+            args += ["-b:v", self.bitrate]
+        return args + list(self.extra_args)
+
+    def audio_args(self):
+        args = ["-c:a", self.audio_codec]
+        if self.audio_bitrate:
+            args += ["-b:a", self.audio_bitrate]
+        return args
+
+class FrameWriter:
+    """Encode (h, w, 3) uint8 RGB frames written in order through an ffmpeg stdin pipe."""
+
+    def __init__(self, path, size, fps, audio_path=None, settings=None, ffmpeg=None):
+        self.path = path
+        self.w, self.h = int(size[0]), int(size[1])
+        self.settings = settings or EncoderSettings()
+        self.frames_written = 0
+        rate = Fraction(fps).limit_denominator(1001)
+        cmd = [ffmpeg or ffmpeg_binary(), "-y", "-v", "error",
+               "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{self.w}x{self.h}",
+               "-r", f"{rate.numerator}/{rate.denominator}", "-i", "-"]
+        if audio_path:
+            cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+        cmd += self.settings.video_args()
+        if audio_path:
+            cmd += self.settings.audio_args()
+        cmd += [path]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame):
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except BrokenPipeError:
+            self._fail()
+        self.frames_written += 1
+
+    def _fail(self):
+        err = self._proc.communicate()[1].decode(errors="replace").strip()
+        raise IOError(f"ffmpeg failed writing {self.path}:\n{err}")
+
+    def close(self):
+        if self._proc.stdin.closed:
+            return
+        self._proc.stdin.close()
+        err = self._proc.stderr.read()
+        if self._proc.wait() != 0:
+            raise IOError(f"ffmpeg failed writing {self.path}:\n{err.decode(errors='replace').strip()}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._proc.kill()
+            self._proc.wait()
+
+def render_filtergraph(input_path, graph, output_path, n_frames, audio_path=None, settings=None,
+                       progress=None, start_time=0.0, ffmpeg=None):
+    """
+    Encode the first n_frames of the [v] output of `graph` (a filtergraph over [0:v]) to
+    output_path, muxed with audio_path's first audio stream. The graph goes through a script
+    file since a long schedule outgrows the command line. progress(frames) is called as
+    ffmpeg reports; returns the number of frames written. With start_time the input is
+    seeked first, so [0:v] starts at the first frame at or after it.
+    """
+    settings = settings or EncoderSettings()
+    fd, script = tempfile.mkstemp(prefix="tempocut_", suffix=".filtergraph")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(graph)
+    cmd = [ffmpeg or ffmpeg_binary(), "-y", "-v", "error", "-nostats", "-progress", "pipe:1"]
+    if start_time > 0:
+        cmd += ["-ss", f"{start_time:.6f}"]
+    cmd += ["-i", input_path]
+    if audio_path:
+        cmd += ["-i", audio_path]
+    cmd += ["-filter_complex_script", script, "-map", "[v]"]
+    if audio_path:
+        cmd += ["-map", "1:a:0"]
+    cmd += settings.video_args() + ["-frames:v", str(int(n_frames))]
+    if audio_path:
+        cmd += settings.audio_args()
+    cmd += [output_path]
+    frames = 0
+    try:
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=err)
+            for line in proc.stdout:
+                if line.startswith(b"frame="):
+                    frames = int(line[6:])
+                    if progress:
+                        progress(frames)
+            if proc.wait() != 0:
+                err.seek(0)
+                raise IOError(f"ffmpeg failed writing {output_path}:\n{err.read().decode(errors='replace').strip()}")
+    finally:
+        os.remove(script)
+    return frames
+
+def concat_files(parts, output_path, audio_path=None, settings=None, ffmpeg=None):
+    """
+    Join video files encoded with the same settings, each starting on a keyframe, by stream
+    copy through the concat demuxer; audio_path's first audio stream is muxed in (encoded
+    with `settings`).
+    """
+    settings = settings or EncoderSettings()
+    fd, listing = tempfile.mkstemp(prefix="tempocut_", suffix=".ffconcat")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for part in parts:
+            path = os.path.abspath(part).replace("'", "'\\''")
+            f.write(f"file '{path}'\n")
+    cmd = [ffmpeg or ffmpeg_binary(), "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", listing]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    cmd += ["-c:v", "copy"]
+    if audio_path:
+        cmd += settings.audio_args()
+    cmd += [output_path]
+    try:
+        proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(listing)
+    if proc.returncode != 0:
+        raise IOError(f"ffmpeg failed joining {len(parts)} parts into {output_path}:\n"
+                      f"{proc.stderr.decode(errors='replace').strip()}")
@@ -0,0 +1,223 @@
+"""
+live.py  —  Low-latency skippy over an unbounded PCM stream (`tempocut audio --live`).
+
+LiveSkippy takes blocks of samples as they arrive and hands back the rendered output
+straight away. Decisions use the planner's rules: frame energies, one lowest-energy
+candidate within half a cadence of every checkpoint, chops at least a cadence apart,
+and crossfades rendered exactly like apply_removals_with_crossfade. A few things
+differ because the stream has no end:
+
+- the energy threshold is the quantile over the last LIVE_HISTORY_S of frames rather
+  than the whole file;
+- the budget is applied as a running rate: a chop is taken only while the output
+  stays within (1 - 1/target_ratio) of the input so far shorter than it, so the ratio
+  is steady instead of front-loaded. As in --target-duration mode the crossfade
+  overlap counts towards it, so the ratio reported is the ratio delivered.
+
+A checkpoint is decided as soon as its window, the chop and the crossfade head have
+arrived. Everything before the earliest sample a later chop could touch is written
+out, so at most `max_latency` samples are ever held back.
+"""
+
+import sys
+import time
+from typing import List, Tuple
+import numpy as np
+from tempo_cut import metrics
+from tempo_cut.skippy import NO_CHOP, frame_energies, xfade
+
+# ---------- Tunables ----------
+LIVE_HISTORY_S = 30.0     # energy quantile over this much recent audio
+LIVE_BLOCK_MS  = 20.0     # stdin read size
+LIVE_REPORT_S  = 5.0      # stderr status line interval
+PCM_FORMATS    = {"s16le": "<i2", "s32le": "<i4", "f32le": "<f4"}
+# ------------------------------
+
+class LiveSkippy:
+    """
+    Incremental skip planner + renderer. feed(block) returns the output that is final so
+    far; finish() flushes the rest once the input has ended. Output is identical to
+    apply_removals_with_crossfade(input, sr, self.removals, crossfade_ms).
+    """
+
+    def __init__(self, sr: int, channels: int, dtype, target_ratio: float, frame_ms: float = 20.0,
+                 max_chop_ms: float = 30.0, cadence_ms: float = 300.0, crossfade_ms: float = 8.0,
+                 energy_quantile: float = 0.4, history_s: float = LIVE_HISTORY_S):
+        assert target_ratio >= 1.0, "target_ratio must be >= 1.0 (speed-up)."
+        self.sr = sr
+        self.frame_len = max(1, int(sr * (frame_ms / 1000.0)))
+        self.per_chop = min(self.frame_len, max(1, int(sr * (max_chop_ms / 1000.0))))
+        self.cadence = max(1, int(sr * (cadence_ms / 1000.0)))
+        self.cross = max(1, int(sr * (crossfade_ms/1000.0)))
+        self.window = self.cadence // 2
+        self.quantile = energy_quantile
+        self.fraction = 1.0 - 1.0/target_ratio
+        self.history = max(1, int(history_s * sr) // self.frame_len)
+
+        self.buf = np.zeros((0, channels), dtype=dtype)   # source samples from self.base on
+        self.base = 0
+        self.total = 0                                    # samples received
+        self.energies = np.zeros(0, dtype=np.float64)     # frame energies from frame self.e_base on
+        self.e_base = 0
+        self.checkpoint = 0                               # next checkpoint to decide
+        self.cursor = 0                                   # next source sample to render
+        self.last_end = NO_CHOP
+        self.removals: List[Tuple[int,int]] = []
+        self.removed = 0                                  # output shortening so far
+        self.written = 0
+        self.held_max = 0                                 # most samples held back after a feed
+
+    @property
+    def max_latency(self) -> int:
+        """Most input samples ever held back after a feed (plus the block being fed)."""
+        return 2*self.window + 2*self.frame_len + self.cross + max(self.frame_len, self.per_chop + self.cross)
+
+    @property
+    def achieved_ratio(self) -> float:
+        return self.cursor / max(1, self.cursor - self.removed)
+
+    # ---------- input ----------
+    def _span(self, a: int, b: int) -> np.ndarray:
+        return self.buf[a-self.base : b-self.base]
+
+    def _need(self, c: int) -> int:
+        """Samples required to decide checkpoint c and render its chop."""
+        hi = (c + self.window) // self.frame_len
+        return hi*self.frame_len + max(self.frame_len, self.per_chop + self.cross)
+
+    def feed(self, block: np.ndarray) -> np.ndarray:
+        self.buf = np.concatenate([self.buf, block.reshape(-1, self.buf.shape[1])])
+        self.total += block.shape[0]
+        n_frames = self.total // self.frame_len
+        done = self.e_base + self.energies.shape[0]
+        if n_frames > done:
+            new = frame_energies(self._span(done*self.frame_len, n_frames*self.frame_len), self.frame_len)
+            self.energies = np.concatenate([self.energies, new])
+        out = []
+        while self._need(self.checkpoint) <= self.total:
+            self._decide(self.checkpoint, out)
+            self.checkpoint += self.cadence
+        self._trim()
+        self.held_max = max(self.held_max, self.total - self.cursor)
+        return self._emit(out)
+
+    def finish(self) -> np.ndarray:
+        """Decide the checkpoints the end of the input cut short and flush everything."""
+        out = []
+        while self.checkpoint < self.total:
+            self._decide(self.checkpoint, out)
+            self.checkpoint += self.cadence
+        if self.cursor < self.total:
+            out.append(self._span(self.cursor, self.total))
+            self.cursor = self.total
+        return self._emit(out)
+
+    # ---------- planning + rendering ----------
+    def _decide(self, c: int, out: list) -> None:
+        fl = self.frame_len
+        n_frames = self.e_base + self.energies.shape[0]
+        lo = max(0, (c - self.window) // fl)
+        hi = min(n_frames-1, (c + self.window) // fl)
+        if lo <= hi:
+            recent = self.energies[max(0, hi+1-self.history-self.e_base) : hi+1-self.e_base]
+            thresh = np.quantile(recent, self.quantile)
+            e = self.energies[lo-self.e_base : hi+1-self.e_base]
+            masked = np.where((e <= thresh) & (e < 1e9), e, np.inf)
+            k = int(np.argmin(masked))
+            if np.isfinite(masked[k]):
+                start = (lo+k)*fl
+                end = min(start + self.per_chop, self.total)
+                if start - self.last_end >= self.cadence and end > start and \
+                   self.removed + self._cost(start, end) <= self.fraction*end:
+                    self._cut(start, end, out)
+        # no later chop (nor its crossfade tail) can reach before the next checkpoint's window
+        safe = max(0, (c + self.cadence - self.window) // fl) * fl - self.cross
+        if safe > self.cursor:
+            out.append(self._span(self.cursor, safe))
+            self.cursor = safe
+
+    def _crossfade(self, start: int, end: int) -> int:
+        """Crossfade length render_segments uses for this chop (0 = hard cut)."""
+        n_tail = start - max(self.cursor, start-self.cross)
+        n_head = min(end+self.cross, self.total) - end
+        return min(n_tail, n_head) if n_tail and n_head else 0
+
+    def _cost(self, start: int, end: int) -> int:
+        """How much shorter the output gets from this chop, crossfade overlap included."""
+        n = self._crossfade(start, end)
+        return end - max(self.cursor, start-self.cross) - n + self.cross if n else end-start
+
+    def _cut(self, start: int, end: int, out: list) -> None:
+        # the same steps as skippy.render_segments for one removal
+        cursor = self.cursor
+        keep_end = max(cursor, start-self.cross)
+        if keep_end > cursor:
+            out.append(self._span(cursor, keep_end))
+        n = self._crossfade(start, end)
+        self.removed += self._cost(start, end)
+        if n:
+            out.append(xfade(self._span(start-n, start), self._span(end, end+n)))
+            self.cursor = end+self.cross
+        else:
+            self.cursor = end
+        self.last_end = end
+        self.removals.append((start, end))
+        metrics.count("removals")
+
+    def _trim(self) -> None:
+        # a crossfade head can run past the last whole frame, whose samples energies still need
+        drop = min(self.cursor, (self.e_base + self.energies.shape[0]) * self.frame_len)
+        if drop > self.base:
+            self.buf = self.buf[drop-self.base:]
+            self.base = drop
+        keep_from = max(0, (self.checkpoint - self.window) // self.frame_len - self.history)
+        if keep_from > self.e_base:
+            self.energies = self.energies[keep_from-self.e_base:]
+            self.e_base = keep_from
+
+    def _emit(self, out: list) -> np.ndarray:
+        y = np.concatenate(out) if out else self.buf[:0]
+        self.written += y.shape[0]
+        return y
+
+def run_live(target_ratio: float, sr: int = 48000, channels: int = 2, pcm_format: str = "s16le",
+             block_ms: float = LIVE_BLOCK_MS, stdin=None, stdout=None, stderr=None, **opts) -> LiveSkippy:
+    """
+    Time-compress raw interleaved PCM from stdin to stdout until EOF, with a status line on
+    stderr every LIVE_REPORT_S. `opts` are LiveSkippy's planner/crossfade options.
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    stderr = stderr or sys.stderr
+    dtype = np.dtype(PCM_FORMATS[pcm_format])
+    live = LiveSkippy(sr, channels, dtype, target_ratio, **opts)
+    frame_bytes = dtype.itemsize * channels
+    block_bytes = max(1, int(sr * block_ms / 1000.0)) * frame_bytes
+    print(f"🔴 Live: {sr} Hz x{channels} {pcm_format}, target ratio {target_ratio}, "
+          f"max added latency {1000.0*(live.max_latency + block_bytes//frame_bytes)/sr:.0f} ms", file=stderr)
+    pending = b""
+    last_report = time.monotonic()
+    with metrics.stage("live"):
+        while True:
+            data = stdin.read(block_bytes)
+            if not data:
+                break
+            data = pending + data
+            n = len(data) - len(data) % frame_bytes
+            pending = data[n:]
+            y = live.feed(np.frombuffer(data[:n], dtype=dtype).reshape(-1, channels))
+            if y.shape[0]:
+                stdout.write(y.astype(dtype, copy=False).tobytes())
+                stdout.flush()
+            if time.monotonic() - last_report >= LIVE_REPORT_S:
+                last_report = time.monotonic()
+                print(f"🔹 {live.total/sr:9.1f}s in, removed {live.removed/sr:6.2f}s, "
+                      f"ratio {live.achieved_ratio:.4f}, holding {1000.0*(live.total-live.cursor)/sr:.0f} ms",
+                      file=stderr)
+        stdout.write(live.finish().astype(dtype, copy=False).tobytes())
+        stdout.flush()
+    metrics.count("samples_in", live.total)
+    metrics.count("samples_out", live.written)
+    print(f"✅ Live done: {live.total/sr:.2f}s -> {live.written/sr:.2f}s, {len(live.removals)} chops, "
+          f"ratio {live.achieved_ratio:.4f}", file=stderr)
+    return live
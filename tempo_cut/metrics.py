@@ -0,0 +1,169 @@
+"""
+metrics.py  —  Per-stage timing and memory for `tempocut ... --metrics out.json`.
+
+Coarse stages (load, energies, plan, render, write, features, dtw, time_map,
+subs) are wrapped in `with metrics.stage(name):` and record wall time, CPU time
+of this process and of ffmpeg children reaped meanwhile, and peak RSS. Per-frame
+work (decode, blend, encode) uses the lighter `metrics.timed(name)`, which only
+adds up wall time and the calling thread's CPU time. `metrics.count(name, n)`
+adds to a counter (removals, frames decoded, cache hits, ...).
+
+Nothing is recorded until enable() is called, so library use pays next to nothing.
+Peak RSS is per stage on Linux (the kernel high-water mark is reset when a stage
+starts); elsewhere it is the process peak so far. stage() is meant for the main
+thread; timed() and count() are thread-safe.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+METRICS_VERSION = 1
+
+_enabled  = False
+_stages   = {}     # name -> record, in first-seen order
+_counters = {}
+_children = {}     # reports of stages run in other processes (batch workers)
+_stack    = []     # peak RSS (kB) seen so far by every open stage, outermost first
+_started  = None
+_lock     = threading.Lock()
+
+def enable() -> None:
+    """Start recording (again) from scratch."""
+    global _enabled, _started
+    _stages.clear(); _counters.clear(); _children.clear()
+    _stack[:] = [0]   # the whole run
+    _reset_peak()
+    _started = (time.perf_counter(), time.process_time(), _children_cpu())
+    _enabled = True
+
+def enabled() -> bool:
+    return _enabled
+
+# ---------- Probes ----------
+
+def _peak_rss_kb():
+    """Peak RSS since the last reset (Linux), else since the process started; None if unknown."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _children_cpu():
+    if resource is None:
+        return 0.0
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+def _fold_peak():
+    """Credit the current high-water mark to every open stage before it is reset."""
+    peak = _peak_rss_kb() or 0
+    for k in range(len(_stack)):
+        _stack[k] = max(_stack[k], peak)
+    return peak
+
+# ---------- Recording ----------
+
+def _record(name):
+    rec = _stages.get(name)
+    if rec is None:
+        rec = _stages[name] = {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0}
+    return rec
+
+@contextmanager
+def stage(name: str):
+    if not _enabled:
+        yield
+        return
+    _fold_peak()
+    _stack.append(0)
+    _reset_peak()
+    w0, c0, ch0 = time.perf_counter(), time.process_time(), _children_cpu()
+    try:
+        yield
+    finally:
+        wall, cpu, child = time.perf_counter()-w0, time.process_time()-c0, _children_cpu()-ch0
+        _fold_peak()
+        peak = _stack.pop()
+        with _lock:
+            rec = _record(name)
+            rec["calls"] += 1
+            rec["wall_s"] += wall
+            rec["cpu_s"] += cpu
+            rec["child_cpu_s"] = rec.get("child_cpu_s", 0.0) + child
+            rec["peak_rss_mb"] = max(rec.get("peak_rss_mb", 0.0), peak / 1024)
+
+@contextmanager
+def timed(name: str):
+    if not _enabled:
+        yield
+        return
+    w0, c0 = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter()-w0, time.thread_time()-c0
+        with _lock:
+            rec = _record(name)
+            rec["calls"] += 1
+            rec["wall_s"] += wall
+            rec["cpu_s"] += cpu
+
+def count(name: str, n=1) -> None:
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+def add_child(key: str, child_report: dict) -> None:
+    """Attach the report of work done in another process, e.g. "ep01/video"."""
+    if _enabled:
+        _children[key] = child_report
+
+# ---------- Report ----------
+
+def report(**extra) -> dict:
+    wall0, cpu0, child0 = _started or (time.perf_counter(), time.process_time(), _children_cpu())
+    out = {
+        "version": METRICS_VERSION,
+        "argv": sys.argv,
+        "pid": os.getpid(),
+        **extra,
+        "wall_s": time.perf_counter() - wall0,
+        "cpu_s": time.process_time() - cpu0,
+        "child_cpu_s": _children_cpu() - child0,
+        "peak_rss_mb": max(_stack[0] if _stack else 0, _peak_rss_kb() or 0) / 1024,
+        "stages": {name: dict(rec) for name, rec in _stages.items()},
+        "counters": dict(_counters),
+    }
+    if _children:
+        out["children"] = dict(_children)
+    return out
+
+def write(path: str, **extra) -> None:
+    """Write report(**extra) as JSON to `path`."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report(**extra), f, indent=2)
+    os.replace(tmp, path)
@@ -0,0 +1,594 @@
+"""
+skippy.py  —  Shared micro-skip planner/renderer for the stereo and surround engines.
+
+The in-memory path (make_skip_plan + apply_removals_with_crossfade) works on a whole
+array. The streaming path (stream_energies + stream_render) walks the file in
+sf.SoundFile blocks and produces a bit-identical plan and output while only holding
+a few seconds of audio at a time.
+
+Samples stay in the narrowest dtype that holds the file exactly (int16 for 8/16-bit
+PCM, int32 for 32-bit PCM, float32 otherwise; see native_dtype) and the output is
+written with the input's subtype, so a 24-bit master comes out 24-bit.
+
+With workers > 1 the in-memory path splits the program into contiguous segments on a
+thread pool (numpy releases the GIL for the heavy lifting): energies and candidate
+picks per segment, cadence continuity stitched at the boundaries, and crossfade
+rendering into disjoint slices of the output. The result is identical to workers=1.
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
+import numpy as np
+import soundfile as sf
+from tempo_cut import cache, metrics
+
+STREAM_BLOCK_MS = 2000.0   # block size for streaming reads/writes
+PLAN_VERSION    = 1        # SkipPlan sidecar format
+ENERGY_VERSION  = 1        # frame_energies algorithm; bump on any change so cached energies/plans are recomputed
+FIT_QUANTILE_STEP = 0.1    # --target-duration: energy_quantile relaxation per round when the cut falls short
+FIT_MIN_CADENCE_MS = 100.0 # --target-duration: never space chops closer than this
+PAR_MIN_FRAMES  = 4096     # parallel mode: fewest energy frames per segment
+ENERGY_CHUNK_FRAMES = 4096 # frame energies: frames squared per pass
+PAR_MIN_CHECKPOINTS = 512  # parallel mode: fewest cadence checkpoints per segment
+PAR_MIN_SEGMENTS = 256     # parallel mode: fewest render segments per worker
+NO_CHOP         = -10**12  # "last removal end" before the first chop
+# PCM read as int16/int32 as is; 24-bit fits float32's mantissa exactly; the rest is float32
+NATIVE_DTYPES   = {"PCM_S8": "int16", "PCM_U8": "int16", "PCM_16": "int16", "PCM_32": "int32"}
+
+@dataclass
+class SkipPlan:
+    removals: List[Tuple[int, int]]
+    achieved_ratio: float
+    removed_ms_total: float
+
+def native_dtype(subtype: str) -> str:
+    """dtype to read a file of this soundfile subtype in without a lossy or oversized conversion."""
+    return NATIVE_DTYPES.get(subtype, "float32")
+
+def output_subtype(input_subtype: str, output_path: str) -> Optional[str]:
+    """The input's subtype if the output's container supports it, else None (soundfile's default)."""
+    fmt = os.path.splitext(output_path)[1][1:].upper()
+    if fmt in sf.available_formats() and sf.check_format(fmt, input_subtype):
+        return input_subtype
+    return None
+
+def read_native(path: str, always_2d: bool = False) -> Tuple[np.ndarray, int, str]:
+    """(samples in native_dtype, sample rate, subtype) of an audio file."""
+    subtype = sf.info(path).subtype
+    x, sr = sf.read(path, dtype=native_dtype(subtype), always_2d=always_2d)
+    return x, sr, subtype
+
+def segment_bounds(n: int, workers: int, min_size: int) -> List[Tuple[int,int]]:
+    """Split range(n) into at most `workers` contiguous (a, b) pieces of at least `min_size`."""
+    k = max(1, min(workers, n // max(1, min_size)))
+    edges = np.linspace(0, n, k+1).astype(np.int64).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+def parallel_map(fn, items, workers: int) -> list:
+    if workers <= 1 or len(items) < 2:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(fn, items))
+
+def frame_energies(samples: np.ndarray, frame_len: int, workers: int = 1) -> np.ndarray:
+    """RMS energy of every whole frame of `samples` (trailing partial frame ignored)."""
+    n_frames = samples.shape[0] // frame_len
+    bounds = segment_bounds(n_frames, workers, PAR_MIN_FRAMES)
+    if len(bounds) > 1:
+        return np.concatenate(parallel_map(
+            lambda ab: frame_energies(samples[ab[0]*frame_len : ab[1]*frame_len], frame_len), bounds, workers))
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len, samples.shape[1]) if samples.ndim == 2 else \
+             samples[: n_frames * frame_len].reshape(n_frames, frame_len, 1)
+    out = np.empty(n_frames, dtype=np.float64 if frames.dtype == np.float64 else np.float32)
+    # a few thousand frames at a time so the squared copy stays small
+    for a in range(0, n_frames, ENERGY_CHUNK_FRAMES):
+        chunk = frames[a : a + ENERGY_CHUNK_FRAMES]
+        if chunk.dtype.kind in "iu":
+            # integer PCM on the same scale (and so the same energies) as a float32 read
+            chunk = chunk.astype(np.float32) * np.float32(-1.0 / np.iinfo(chunk.dtype).min)
+        out[a : a + ENERGY_CHUNK_FRAMES] = np.mean(chunk**2, axis=(1,2))
+    return np.sqrt(out + 1e-12)
+
+def best_candidates(energies: np.ndarray, is_candidate: np.ndarray, checkpoints: np.ndarray,
+                    window_samples: int, frame_len: int) -> np.ndarray:
+    """
+    Lowest-energy candidate frame within +/- window_samples of every checkpoint, or -1
+    where the window holds no candidate. Ties go to the earliest frame.
+    """
+    n_frames = energies.shape[0]
+    if n_frames == 0 or checkpoints.shape[0] == 0:
+        return np.full(checkpoints.shape[0], -1, dtype=np.int64)
+    masked = np.where(is_candidate & (energies < 1e9), energies, np.inf)
+    lo = np.maximum(0, (checkpoints - window_samples) // frame_len)
+    hi = np.minimum(n_frames-1, (checkpoints + window_samples) // frame_len)
+    width = int((hi - lo).max()) + 1 if lo.shape[0] else 1
+    # Masked sliding-window argmin over a (checkpoints, width) gather of frame indices
+    idx = lo[:, None] + np.arange(max(width, 1))[None, :]
+    window = np.where(idx <= hi[:, None], masked[np.minimum(idx, n_frames-1)], np.inf)
+    pick = np.argmin(window, axis=1)
+    best = lo + pick
+    best[~np.isfinite(window[np.arange(window.shape[0]), pick])] = -1
+    return best
+
+def plan_from_energies(
+    energies: np.ndarray,
+    total_samples: int,
+    sr: int,
+    target_ratio: float,
+    frame_ms: float = 20.0,
+    max_chop_ms: float = 30.0,
+    cadence_ms: float = 300.0,
+    energy_quantile: float = 0.4,
+    workers: int = 1,
+) -> SkipPlan:
+    assert target_ratio >= 1.0, "target_ratio must be >= 1.0 (speed-up)."
+    if target_ratio == 1.0:
+        return SkipPlan(removals=[], achieved_ratio=1.0, removed_ms_total=0.0)
+
+    duration_s = total_samples / sr
+    remove_s = duration_s * (1.0 - 1.0 / target_ratio)
+    if remove_s <= 0:
+        return SkipPlan(removals=[], achieved_ratio=1.0, removed_ms_total=0.0)
+
+    frame_len = max(1, int(sr * (frame_ms / 1000.0)))
+    max_chop = max(1, int(sr * (max_chop_ms / 1000.0)))
+    cadence = max(1, int(sr * (cadence_ms / 1000.0)))
+
+    remove_samples_total = int(remove_s * sr)
+    removals = pick_removals(energies, total_samples, frame_len, max_chop, cadence, energy_quantile, remove_samples_total,
+                             workers=workers)
+    removed_so_far = sum(end-start for start, end in removals)
+
+    achieved_ratio = (total_samples / sr) / ((total_samples - removed_so_far) / sr)
+    return SkipPlan(removals=removals, achieved_ratio=float(achieved_ratio), removed_ms_total=1000.0*removed_so_far/sr)
+
+def cadence_scan(starts: List[int], ends: List[int], cadence: int, last_removal_end: int,
+                 rejoin: Optional[List[int]] = None) -> List[int]:
+    """
+    Indices of the candidate chops kept by the greedy spacing rule, given the end of the
+    chop before them. `rejoin` is a scan of the same chops from another starting point:
+    once both keep the same chop they agree on everything after it, so the rest is reused.
+    """
+    pos = {i: p for p, i in enumerate(rejoin)} if rejoin is not None else {}
+    kept = []
+    for i in range(len(starts)):
+        if starts[i] - last_removal_end < cadence or ends[i] <= starts[i]:
+            continue
+        kept.append(i)
+        last_removal_end = ends[i]
+        if i in pos:
+            return kept + rejoin[pos[i]+1:]
+    return kept
+
+def pick_removals(energies: np.ndarray, total_samples: int, frame_len: int, max_chop: int, cadence: int,
+                  energy_quantile: float, budget: Optional[int] = None, workers: int = 1) -> List[Tuple[int,int]]:
+    """Greedy chop list: one candidate per cadence window, until `budget` samples are chopped (None = all)."""
+    thresh = np.quantile(energies, energy_quantile)
+    is_candidate = energies <= thresh
+    checkpoints = np.arange(0, total_samples, cadence, dtype=np.int64)
+    per_chop = min(frame_len, max_chop)
+
+    def segment(ab):
+        best = best_candidates(energies, is_candidate, checkpoints[ab[0]:ab[1]], cadence // 2, frame_len)
+        starts = best[best >= 0] * frame_len
+        starts, ends = starts.tolist(), np.minimum(starts + per_chop, total_samples).tolist()
+        # scanned as if no chop came before; fixed up below once the previous segment is known
+        return starts, ends, cadence_scan(starts, ends, cadence, NO_CHOP)
+
+    # Only the cadence-spacing check depends on earlier picks: each segment is rescanned
+    # from the real last chop of the one before until it rejoins its own speculative scan.
+    removals: List[Tuple[int,int]] = []
+    last_removal_end = NO_CHOP
+    for starts, ends, guess in parallel_map(segment, segment_bounds(checkpoints.shape[0], workers, PAR_MIN_CHECKPOINTS), workers):
+        kept = cadence_scan(starts, ends, cadence, last_removal_end, rejoin=guess)
+        removals += [(starts[i], ends[i]) for i in kept]
+        if kept:
+            last_removal_end = ends[kept[-1]]
+
+    if budget is not None:
+        removed_so_far = 0
+        for k, (start, end) in enumerate(removals):
+            if removed_so_far >= budget:
+                return removals[:k]
+            removed_so_far += end-start
+    return removals
+
+def make_skip_plan(
+    samples: np.ndarray,
+    sr: int,
+    target_ratio: float,
+    frame_ms: float = 20.0,
+    max_chop_ms: float = 30.0,
+    cadence_ms: float = 300.0,
+    energy_quantile: float = 0.4,
+    workers: int = 1,
+) -> SkipPlan:
+    assert target_ratio >= 1.0, "target_ratio must be >= 1.0 (speed-up)."
+    if target_ratio == 1.0:
+        return SkipPlan(removals=[], achieved_ratio=1.0, removed_ms_total=0.0)
+    frame_len = max(1, int(sr * (frame_ms / 1000.0)))
+    energies = frame_energies(samples, frame_len, workers=workers)
+    return plan_from_energies(energies, samples.shape[0], sr, target_ratio, frame_ms=frame_ms,
+                              max_chop_ms=max_chop_ms, cadence_ms=cadence_ms, energy_quantile=energy_quantile,
+                              workers=workers)
+
+def render_segments(removals: List[Tuple[int,int]], total_samples: int, cross: int) -> Iterator[Tuple[int, int, Optional[int]]]:
+    """
+    Describe the rendered output as source ranges, in output order.
+    Yields (a, b, None) for a straight copy of samples[a:b], or (a, b, h) for a
+    crossfade of tail samples[a:b] into head samples[h:h+(b-a)].
+    """
+    cursor = 0
+    for start, end in removals:
+        keep_end = max(cursor, start-cross)
+        if keep_end > cursor:
+            yield cursor, keep_end, None
+        n_tail = max(0, start - max(cursor, start-cross))
+        n_head = max(0, min(end+cross, total_samples) - end)
+        if n_tail and n_head:
+            n = min(n_tail, n_head)
+            yield start-n, start, end
+            cursor = end+cross
+        else:
+            cursor = end
+    if cursor < total_samples:
+        yield cursor, total_samples, None
+
+def output_length(removals: List[Tuple[int,int]], total_samples: int, cross: int) -> int:
+    """Exact rendered length in samples for a removal list."""
+    if not removals:
+        return total_samples
+    return sum(b-a for a, b, _ in render_segments(removals, total_samples, cross))
+
+@lru_cache(maxsize=8)
+def fade_ramp(n: int, dtype: np.dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """(fade-out, fade-in) weights for an n-sample crossfade; cached since n is almost always `cross`."""
+    t = np.linspace(0,1,n,endpoint=False,dtype=dtype)
+    wa, wb = 1.0-t, t
+    wa.flags.writeable = False
+    wb.flags.writeable = False
+    return wa, wb
+
+def xfade(a: np.ndarray, b: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if a.dtype.kind in "iu":
+        # integer PCM: mix in float64 and round back onto the integer grid
+        y = np.rint(xfade(a.astype(np.float64), b.astype(np.float64)))
+        if out is None:
+            return y.astype(a.dtype)
+        np.copyto(out, y, casting="unsafe")
+        return out
+    wa, wb = fade_ramp(a.shape[0], a.dtype)
+    if a.ndim == 2:
+        wa, wb = wa[:,None], wb[:,None]
+    if out is None:
+        return a*wa + b*wb
+    np.multiply(a, wa, out=out)
+    out += b*wb
+    return out
+
+def apply_removals_with_crossfade(samples: np.ndarray, sr: int, removals: List[Tuple[int,int]], crossfade_ms: float = 8.0,
+                                  out: Optional[np.ndarray] = None, workers: int = 1) -> np.ndarray:
+    """
+    Render `samples` with `removals` cut out and crossfaded. The output is written into
+    a single buffer of the exact rendered length and the input dtype; pass `out` (for
+    example an np.memmap) to supply that buffer yourself. With workers > 1, runs of
+    segments are rendered into their own slices of `out` in parallel.
+    """
+    if not removals:
+        return samples
+
+    cross = max(1, int(sr * (crossfade_ms/1000.0)))
+    segments = list(render_segments(removals, samples.shape[0], cross))
+    offsets = np.cumsum([0] + [b-a for a, b, _ in segments]).tolist()
+    n_out = offsets[-1]
+    if out is None:
+        out = np.empty((n_out,) + samples.shape[1:], dtype=samples.dtype)
+    elif out.shape != (n_out,) + samples.shape[1:]:
+        raise ValueError(f"out has shape {out.shape}, expected {(n_out,) + samples.shape[1:]}")
+
+    def render(ab):
+        for k in range(*ab):
+            a, b, h = segments[k]
+            pos, n = offsets[k], b-a
+            if h is None:
+                out[pos:pos+n] = samples[a:b]
+            else:
+                xfade(samples[a:b], samples[h:h+n], out=out[pos:pos+n])
+
+    parallel_map(render, segment_bounds(len(segments), workers, PAR_MIN_SEGMENTS), workers)
+    return out
+
+# ---------- Target-duration solver ----------
+
+def parse_duration(text: str) -> float:
+    """Seconds from "[[HH:]MM:]SS[.fff]", e.g. "21:30.000" -> 1290.0."""
+    secs = 0.0
+    try:
+        for part in str(text).strip().split(":"):
+            secs = secs*60 + float(part)
+    except ValueError:
+        raise ValueError(f"bad duration {text!r} (expected [[HH:]MM:]SS[.fff])") from None
+    return secs
+
+def duration_arg(text: str) -> float:
+    """argparse `type=` for --target-duration: a bad value is a usage error, not a traceback."""
+    try:
+        return parse_duration(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+def fit_removals(removals: List[Tuple[int,int]], total_samples: int, cross: int, target_len: int) -> List[Tuple[int,int]]:
+    """
+    Shortest prefix of `removals` that renders to <= target_len samples, with its last
+    chop trimmed so the rendered length lands as close to target_len as possible.
+    """
+    lo, hi = 0, len(removals)
+    while lo < hi:
+        mid = (lo+hi) // 2
+        if output_length(removals[:mid], total_samples, cross) <= target_len:
+            hi = mid
+        else:
+            lo = mid+1
+    fitted = removals[:lo]
+    short = target_len - output_length(fitted, total_samples, cross)
+    if fitted and short > 0:
+        # every chop also drops its crossfade, so trimming can't close the last `cross` samples;
+        # keep whichever of (trimmed chop, one chop fewer) ends up closer
+        start, end = fitted[-1]
+        trimmed = fitted[:-1] + [(start, max(start+1, end-short))]
+        fitted = min((trimmed, removals[:lo-1]),
+                     key=lambda r: abs(output_length(r, total_samples, cross) - target_len))
+    return fitted
+
+def plan_for_duration(
+    energies: np.ndarray,
+    total_samples: int,
+    sr: int,
+    target_duration: float,
+    frame_ms: float = 20.0,
+    max_chop_ms: float = 30.0,
+    cadence_ms: float = 300.0,
+    crossfade_ms: float = 8.0,
+    energy_quantile: float = 0.4,
+    workers: int = 1,
+) -> SkipPlan:
+    """
+    Plan whose rendered output is `target_duration` seconds long to within one frame.
+    Reruns the planner over the cached energies, relaxing energy_quantile and then
+    cadence_ms until enough candidates exist, then fits the chop list to the length.
+    """
+    target_len = int(round(target_duration * sr))
+    if target_len > total_samples:
+        raise ValueError(f"target duration {target_duration:.3f}s is longer than the input ({total_samples/sr:.3f}s)")
+    if target_len == total_samples:
+        return SkipPlan(removals=[], achieved_ratio=1.0, removed_ms_total=0.0)
+
+    frame_len = max(1, int(sr * (frame_ms / 1000.0)))
+    max_chop = max(1, int(sr * (max_chop_ms / 1000.0)))
+    cross = max(1, int(sr * (crossfade_ms/1000.0)))
+    quantile = energy_quantile
+    prev = None
+    while True:
+        cadence = max(1, int(sr * (cadence_ms / 1000.0)))
+        removals = pick_removals(energies, total_samples, frame_len, max_chop, cadence, quantile, workers=workers)
+        shortest = output_length(removals, total_samples, cross)
+        if shortest <= target_len:
+            break
+        # more quiet candidates only help while the cadence windows aren't all used up
+        stalled = prev is not None and shortest >= prev
+        prev = shortest
+        if quantile < 1.0 and not stalled:
+            quantile = min(1.0, round(quantile + FIT_QUANTILE_STEP, 6))
+        elif cadence_ms > FIT_MIN_CADENCE_MS:
+            cadence_ms = max(FIT_MIN_CADENCE_MS, cadence_ms / 2)
+            prev = None
+        elif quantile < 1.0:
+            quantile = min(1.0, round(quantile + FIT_QUANTILE_STEP, 6))
+        else:
+            raise ValueError(f"can't reach {target_duration:.3f}s: the most the planner can cut "
+                             f"leaves {shortest/sr:.3f}s")
+        print(f"[INFO] Shortest reachable is {shortest/sr:.3f}s; retrying with "
+              f"energy-quantile {quantile:.2f}, cadence-ms {cadence_ms:g}")
+
+    removals = fit_removals(removals, total_samples, cross, target_len)
+    new_len = output_length(removals, total_samples, cross)
+    removed = sum(end-start for start, end in removals)
+    return SkipPlan(removals=removals, achieved_ratio=total_samples/new_len, removed_ms_total=1000.0*removed/sr)
+
+def make_duration_plan(
+    samples: np.ndarray,
+    sr: int,
+    target_duration: float,
+    frame_ms: float = 20.0,
+    max_chop_ms: float = 30.0,
+    cadence_ms: float = 300.0,
+    crossfade_ms: float = 8.0,
+    energy_quantile: float = 0.4,
+    workers: int = 1,
+) -> SkipPlan:
+    frame_len = max(1, int(sr * (frame_ms / 1000.0)))
+    return plan_for_duration(frame_energies(samples, frame_len, workers=workers), samples.shape[0], sr, target_duration,
+                             frame_ms=frame_ms, max_chop_ms=max_chop_ms, cadence_ms=cadence_ms,
+                             crossfade_ms=crossfade_ms, energy_quantile=energy_quantile, workers=workers)
+
+def plan_file(
+    input_path: str,
+    sr: int,
+    total_samples: int,
+    energies_fn: Callable[[int], np.ndarray],
+    target_ratio: Optional[float] = None,
+    target_duration: Optional[float] = None,
+    frame_ms: float = 20.0,
+    max_chop_ms: float = 30.0,
+    cadence_ms: float = 300.0,
+    crossfade_ms: float = 8.0,
+    energy_quantile: float = 0.4,
+    workers: int = 1,
+) -> SkipPlan:
+    """
+    Skip plan for the audio file at input_path, through the analysis cache. A plan cached for
+    the same content and parameters is reused as is; otherwise the frame energies (cached, or
+    energies_fn(frame_len)) are planned by target_ratio or fitted to target_duration.
+    `workers` only changes how fast the plan is found, so it is not part of the cache key.
+    """
+    # energies (and so plans) depend on the dtype the file is read in and on frame_energies itself
+    dtype = native_dtype(sf.info(input_path).subtype)
+    params = dict(frame_ms=frame_ms, max_chop_ms=max_chop_ms, cadence_ms=cadence_ms,
+                  energy_quantile=energy_quantile, version=PLAN_VERSION, dtype=dtype, energy_version=ENERGY_VERSION)
+    if target_duration is not None:
+        params.update(target_duration=target_duration, crossfade_ms=crossfade_ms)
+    else:
+        params.update(target_ratio=target_ratio)
+    plan_key = cache.make_key("plan", [input_path], **params) if cache.enabled() else None
+    hit = cache.get(plan_key) if plan_key else None
+    if hit is not None:
+        print("[INFO] Skip plan reused from cache")
+        metrics.count("removals", len(hit["removals"]))
+        return SkipPlan(removals=[(int(a), int(b)) for a, b in hit["removals"]],
+                        achieved_ratio=float(hit["achieved_ratio"]), removed_ms_total=float(hit["removed_ms_total"]))
+
+    frame_len = max(1, int(sr * (frame_ms / 1000.0)))
+    with metrics.stage("energies"):
+        energies_key = cache.make_key("energies", [input_path], frame_len=frame_len, dtype=dtype,
+                                      version=ENERGY_VERSION) if cache.enabled() else None
+        hit = cache.get(energies_key) if energies_key else None
+        if hit is not None:
+            energies = hit["energies"]
+        else:
+            energies = energies_fn(frame_len)
+            if energies_key:
+                cache.put(energies_key, energies=energies)
+
+    with metrics.stage("plan"):
+        if target_duration is not None:
+            plan = plan_for_duration(energies, total_samples, sr, target_duration, frame_ms=frame_ms, max_chop_ms=max_chop_ms,
+                                     cadence_ms=cadence_ms, crossfade_ms=crossfade_ms, energy_quantile=energy_quantile,
+                                     workers=workers)
+        else:
+            plan = plan_from_energies(energies, total_samples, sr, target_ratio, frame_ms=frame_ms, max_chop_ms=max_chop_ms,
+                                      cadence_ms=cadence_ms, energy_quantile=energy_quantile, workers=workers)
+    metrics.count("removals", len(plan.removals))
+    if plan_key:
+        cache.put(plan_key, removals=np.asarray(plan.removals, dtype=np.int64).reshape(-1, 2),
+                  achieved_ratio=plan.achieved_ratio, removed_ms_total=plan.removed_ms_total)
+    return plan
+
+# ---------- Plan sidecar / analytic time map ----------
+
+def plan_sidecar_path(audio_path: str) -> str:
+    """Sidecar written next to the skippy audio, e.g. output.wav -> output_plan.npz."""
+    return audio_path.rsplit(".",1)[0]+"_plan.npz"
+
+def save_plan(path: str, plan: SkipPlan, sr: int, total_samples: int, crossfade_ms: float) -> None:
+    with open(path, "wb") as f:
+        np.savez(f, version=PLAN_VERSION,
+                 removals=np.asarray(plan.removals, dtype=np.int64).reshape(-1, 2),
+                 sr=sr, total_samples=total_samples, crossfade_ms=crossfade_ms,
+                 achieved_ratio=plan.achieved_ratio, removed_ms_total=plan.removed_ms_total)
+
+def load_plan(path: str) -> Tuple[SkipPlan, int, int, float]:
+    """Returns (plan, sr, total_samples, crossfade_ms)."""
+    with np.load(path) as z:
+        version = int(z["version"])
+        if version != PLAN_VERSION:
+            raise ValueError(f"{path}: unsupported plan version {version} (expected {PLAN_VERSION})")
+        plan = SkipPlan(removals=[(int(a), int(b)) for a, b in z["removals"]],
+                        achieved_ratio=float(z["achieved_ratio"]), removed_ms_total=float(z["removed_ms_total"]))
+        return plan, int(z["sr"]), int(z["total_samples"]), float(z["crossfade_ms"])
+
+def time_map_from_plan(removals: List[Tuple[int,int]], total_samples: int, sr: int, crossfade_ms: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact (t_skip, t_orig) breakpoints in seconds for a rendered plan. Copies map 1:1;
+    each crossfade maps linearly from the start of its tail to the end of its head.
+    """
+    cross = max(1, int(sr * (crossfade_ms/1000.0)))
+    segments = render_segments(removals, total_samples, cross) if removals else [(0, total_samples, None)]
+    pts = [(0, 0)]
+    pos = 0
+    for a, b, h in segments:
+        n = b-a
+        src_end = b if h is None else h+n
+        if pts[-1] != (pos, a):
+            pts.append((pos, a))
+        pts.append((pos+n, src_end))
+        pos += n
+    arr = np.asarray(pts, dtype=np.float64) / sr
+    return arr[:,0], arr[:,1]
+
+# ---------- Streaming (constant memory) ----------
+
+def stream_energies(path: str, frame_len: int, blocksize: int, always_2d: bool = False) -> Tuple[np.ndarray, int, int]:
+    """Frame energies of a file read in blocks of whole frames. Returns (energies, sr, total_samples)."""
+    frames_per_block = max(1, blocksize // frame_len)
+    parts = []
+    with sf.SoundFile(path) as f:
+        sr, total = f.samplerate, f.frames
+        for block in f.blocks(blocksize=frames_per_block*frame_len, dtype=native_dtype(f.subtype), always_2d=always_2d):
+            parts.append(frame_energies(block, frame_len))
+    energies = np.concatenate(parts) if parts else np.zeros(0)
+    return energies, sr, total
+
+def stream_render(input_path: str, output_path: str, removals: List[Tuple[int,int]], crossfade_ms: float = 8.0,
+                  blocksize: int = 65536, always_2d: bool = False) -> int:
+    """Block-wise apply_removals_with_crossfade from file to file. Returns output length in samples."""
+    written = 0
+    with sf.SoundFile(input_path) as f:
+        sr, total = f.samplerate, f.frames
+        cross = max(1, int(sr * (crossfade_ms/1000.0)))
+        dtype = native_dtype(f.subtype)
+
+        def read(a, b):
+            if f.tell() != a:
+                f.seek(a)
+            return f.read(b-a, dtype=dtype, always_2d=always_2d)
+
+        with sf.SoundFile(output_path, "w", samplerate=sr, channels=f.channels,
+                          subtype=output_subtype(f.subtype, output_path)) as out:
+            segments = render_segments(removals, total, cross) if removals else [(0, total, None)]
+            for a, b, h in segments:
+                if h is None:
+                    for pos in range(a, b, blocksize):
+                        out.write(read(pos, min(pos+blocksize, b)))
+                else:
+                    tail = read(a, b)
+                    head = read(h, h+(b-a))
+                    out.write(xfade(tail, head))
+                written += b-a
+    return written
+
+def compress_file_streaming(
+    input_path: str,
+    output_path: str,
+    target_ratio: float,
+    frame_ms: float = 20.0,
+    max_chop_ms: float = 30.0,
+    cadence_ms: float = 300.0,
+    crossfade_ms: float = 8.0,
+    energy_quantile: float = 0.4,
+    block_ms: float = STREAM_BLOCK_MS,
+    always_2d: bool = False,
+    target_duration: Optional[float] = None,
+    workers: int = 1,
+) -> Tuple[SkipPlan, int, int, int]:
+    """
+    Two-pass streaming compress (energies, then render). Returns (plan, sr, orig_len, new_len).
+    With `target_duration` (seconds) the plan is fitted to that length and target_ratio is ignored.
+    Reading and writing stay sequential; `workers` parallelizes the candidate picks.
+    """
+    info = sf.info(input_path)
+    sr, total = info.samplerate, info.frames
+    blocksize = max(max(1, int(sr * (frame_ms / 1000.0))), int(sr * (block_ms / 1000.0)))
+    plan = plan_file(input_path, sr, total,
+                     lambda frame_len: stream_energies(input_path, frame_len, blocksize, always_2d=always_2d)[0],
+                     target_ratio=target_ratio, target_duration=target_duration, frame_ms=frame_ms,
+                     max_chop_ms=max_chop_ms, cadence_ms=cadence_ms, crossfade_ms=crossfade_ms,
+                     energy_quantile=energy_quantile, workers=workers)
+    # reads, crossfades and writes block by block, so render and write are one stage here
+    with metrics.stage("render"):
+        new_len = stream_render(input_path, output_path, plan.removals, crossfade_ms=crossfade_ms,
+                                blocksize=blocksize, always_2d=always_2d)
+    return plan, sr, total, new_len
@@ -1,40 +1,157 @@
+"""
+subs.py  —  Subtitle retime through the t_skip <-> t_orig warp map.
+
+Every cue time in a track is pulled out with one regex pass over the file text,
+mapped in a single vectorized WarpMap.to_skip lookup, and spliced back into the original text,
+so everything except the timestamps (numbering, styling, VTT cue settings, ASS
+fields) is written back untouched. SRT, WebVTT and ASS/SSA are handled natively;
+other formats, and writing a track out in a different format, fall back to pysubs2
+if it is installed. Many tracks can be retimed
+against one map per invocation, across a process pool.
+"""
+
+import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import pysrt
+from tempo_cut import metrics
+from tempo_cut.warpmap import WarpMap
 
-def map_time(t, t_skip, t_orig):
-    return np.interp(t, t_orig, t_skip)
+MIN_CUE_S = 0.1   # retimed cues are never shorter than this
+MS_EPS    = 1e-6  # absorbs float noise before truncating to whole ms
 
-def retime_subs(map_file, input_srt, output_srt):
-    # Load the 2D array
-    arr = np.load(map_file, allow_pickle=True)
-    if arr.ndim != 2 or arr.shape[1] != 2:
-        raise ValueError("Expected a 2D array with 2 columns (t_skip, t_orig).")
+_SRT = re.compile(r"^([ \t]*)(\d+):(\d\d):(\d\d)[,.](\d{1,3})[ \t]*-->[ \t]*(\d+):(\d\d):(\d\d)[,.](\d{1,3})", re.M)
+_VTT = re.compile(r"^([ \t]*)(?:(\d+):)?(\d\d):(\d\d)\.(\d{3})[ \t]+-->[ \t]+(?:(\d+):)?(\d\d):(\d\d)\.(\d{3})", re.M)
+_ASS = re.compile(r"^((?:Dialogue|Comment):[ \t]*[^,\n]*,)(\d+):(\d\d):(\d\d)\.(\d\d),(\d+):(\d\d):(\d\d)\.(\d\d)", re.M)
+FORMATS = {".srt": "srt", ".vtt": "vtt", ".ass": "ass", ".ssa": "ass"}
+
+def retime_cues(start_ms, end_ms, warp):
+    """Map arrays of cue start/end times (ms, source timeline) to the skippy timeline (ms)."""
+    t = warp.to_skip(np.concatenate([start_ms, end_ms]) / 1000.0)
+    new_start, new_end = np.split(t, 2)
+    # Safety: no negative times and avoid zero-length subs
+    new_start = np.maximum(0, new_start)
+    new_end = np.maximum(new_start + MIN_CUE_S, new_end)
+    return (new_start * 1000 + MS_EPS).astype(np.int64), (new_end * 1000 + MS_EPS).astype(np.int64)
+
+# (pattern, output template for one start/end pair, fraction digits in the source)
+_FORMATS = {
+    "srt": (_SRT, "%s%02d:%02d:%02d,%03d --> %02d:%02d:%02d,%03d", 3),
+    "vtt": (_VTT, "%s%02d:%02d:%02d.%03d --> %02d:%02d:%02d.%03d", 3),
+    "ass": (_ASS, "%s%d:%02d:%02d.%02d,%d:%02d:%02d.%02d", 2),
+}
+
+def _split_ms(ms, frac_div):
+    return ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000 // frac_div
 
-    t_skip = arr[:, 0]
-    t_orig = arr[:, 1]
+def retime_text(text, fmt, warp):
+    """Retime every cue in subtitle `text` of format "srt", "vtt" or "ass". Returns (text, n_cues)."""
+    pattern, template, frac_digits = _FORMATS[fmt]
+    # split() interleaves the text between cues with the 9 captured groups of each timing
+    parts = pattern.split(text)
+    n = (len(parts) - 1) // 10
+    if n == 0:
+        return text, 0
+    fields = [parts[1+k::10] for k in range(1, 9)]
+    h0, m0, s0, f0, h1, m1, s1, f1 = (np.array([int(v or 0) for v in col], dtype=np.int64) for col in fields)
+    # fractions: "5" in ",5" means 500 ms; ASS centiseconds
+    scale = 10 ** (3 - np.array([len(v) for v in fields[3]]))
+    start_ms = ((h0*60 + m0)*60 + s0)*1000 + f0*scale
+    scale = 10 ** (3 - np.array([len(v) for v in fields[7]]))
+    end_ms = ((h1*60 + m1)*60 + s1)*1000 + f1*scale
+    starts, ends = retime_cues(start_ms, end_ms, warp)
+
+    frac_div = 10 ** (3 - frac_digits)
+    cols = np.stack(_split_ms(starts, frac_div) + _split_ms(ends, frac_div), axis=1).tolist()
+    parts[1::10] = [template % ((lead,) + tuple(c)) for lead, c in zip(parts[1::10], cols)]
+    for k in range(2, 10):
+        parts[k::10] = [""] * n
+    return "".join(parts), n
+
+def _read_text(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return raw.decode("cp1252", errors="replace")
+
+def retime_file(input_path, output_path, warp, fps=None):
+    """
+    Retime one subtitle file. Returns the cue count. When input and output are the same
+    native format the text is retimed in place; otherwise pysubs2 converts to the output
+    extension's format.
+    """
+    fmt = FORMATS.get(os.path.splitext(input_path)[1].lower())
+    if fmt is None or fmt != FORMATS.get(os.path.splitext(output_path)[1].lower()):
+        return _retime_pysubs2(input_path, output_path, warp, fps)
+    text, n = retime_text(_read_text(input_path), fmt, warp)
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return n
+
+def _retime_pysubs2(input_path, output_path, warp, fps):
+    import pysubs2   # optional: only for conversions and formats without a native parser (e.g. MicroDVD .sub)
+    subs = pysubs2.load(input_path, fps=fps)
+    starts, ends = retime_cues(np.array([line.start for line in subs], dtype=np.int64),
+                               np.array([line.end for line in subs], dtype=np.int64), warp)
+    for line, a, b in zip(subs, starts.tolist(), ends.tolist()):
+        line.start, line.end = a, b
+    if os.path.splitext(output_path)[1].lower() == ".stl":
+        subs.save(output_path, format="srt", fps=fps)   # pysubs2 has no .stl writer
+    else:
+        subs.save(output_path, fps=fps)
+    return len(subs)
+
+def retime_subs(map_file, input_srt, output_srt):
+    with metrics.stage("subs"):
+        n = retime_file(input_srt, output_srt, WarpMap.load(map_file))
+    metrics.count("cues", n)
 
-    subs = pysrt.open(input_srt)
+# ---------- Many tracks ----------
 
-    for sub in subs:
-        start_sec = sub.start.ordinal / 1000.0
-        end_sec   = sub.end.ordinal / 1000.0
+_worker_map = None
 
-        new_start = map_time(start_sec, t_skip, t_orig)
-        new_end   = map_time(end_sec, t_skip, t_orig)
+def _init_worker(map_file):
+    global _worker_map
+    _worker_map = WarpMap.load(map_file)
 
-        # Safety: no negative times and avoid zero-length subs
-        new_start = max(0, new_start)
-        new_end   = max(new_start + 0.1, new_end)
+def _retime_job(job):
+    src, dst, fps = job
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    try:
+        return src, retime_file(src, dst, _worker_map, fps=fps), None
+    except Exception as e:
+        return src, 0, f"{type(e).__name__}: {e}"
 
-        sub.start.ordinal = int(new_start * 1000)
-        sub.end.ordinal   = int(new_end * 1000)
+def collect_tracks(inputs, out_dir):
+    """(input, output) pairs for subtitle files and folders (searched recursively) under `inputs`."""
+    jobs = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for fn in sorted(files):
+                    if os.path.splitext(fn)[1].lower() in FORMATS:
+                        src = os.path.join(root, fn)
+                        jobs.append((src, os.path.join(out_dir, os.path.relpath(src, path))))
+        else:
+            jobs.append((path, os.path.join(out_dir, os.path.basename(path))))
+    return jobs
 
-    subs.save(output_srt, encoding="utf-8")
+def retime_many(map_file, pairs, jobs=None, fps=None):
+    """Retime every (input, output) pair against one map. Returns a list of (input, cues, error)."""
+    work = [(src, dst, fps) for src, dst in pairs]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(work) < 2:
+        _init_worker(map_file)
+        return [_retime_job(w) for w in work]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(map_file,)) as pool:
+        return list(pool.map(_retime_job, work, chunksize=max(1, len(work) // (jobs*8))))
 
 if __name__ == "__main__":
     if len(sys.argv) != 4:
-        print("Usage: python retime_subs.py <map.npy> <input.srt> <output.srt>")
+        print("Usage: python retime_subs.py <map.npz> <input.srt> <output.srt>")
         sys.exit(1)
 
     map_file, input_srt, output_srt = sys.argv[1:4]
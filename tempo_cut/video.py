@@ -3,14 +3,29 @@
 TBS-style DTW video compressor (fast version)
 - Output: 59.94p with smear blending.
 - Nearest-frame timing + micro-smear every N frames.
-- Saves DTW warp map for subtitle retiming.
-- Optimized with frame cache and float16 blending.
+- Saves the warp map (WarpMap .npz) for subtitle retiming.
+- With a skip plan sidecar (-p), the warp map is built analytically and DTW is skipped.
+- Source frames decoded once, sequentially, from an ffmpeg pipe into an LRU cache.
+- Smear frames blended in uint16 fixed point in a worker pool, streamed in order into ffmpeg.
+- --render ffmpeg compiles the same frame schedule into a filtergraph and lets one ffmpeg
+  process decode, select, blend and encode without any pixels passing through Python.
+- --segments N renders N slices of the output timeline in parallel processes, each with its
+  own decoder and encoder, and joins them with a stream-copy concat.
+- Long outputs render in pieces of CHECKPOINT_FRAMES under <output>.parts with a checkpoint
+  (warp map + finished pieces); rerunning on the same inputs resumes where it stopped.
 """
 
-import argparse, os, numpy as np, librosa
-from moviepy.editor import VideoFileClip, AudioFileClip, VideoClip
+import argparse, json, os, shutil, threading, numpy as np, soundfile as sf
+from fractions import Fraction
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, replace
 from tqdm import tqdm
-from collections import OrderedDict
+from tempo_cut.skippy import load_plan, segment_bounds
+from tempo_cut.warpmap import WarpMap, MAP_FILENAME
+from tempo_cut import cache, metrics
+from tempo_cut.align import banded_dtw, DTW_BAND_FRAC, DTW_RADIUS, DTW_MIN_SIZE
+from tempo_cut.ffio import FrameReader, FrameWriter, EncoderSettings, read_audio, render_filtergraph, concat_files
 
 # ---------- Tunables ----------
 TARGET_SR            = 16000
@@ -20,12 +35,21 @@ TIME_DECIM           = 2
 MAX_JUMP_RATIO       = 1.2
 MICRO_BLEND_FRAMES   = 20        # apply smear every 20 frames
 MICRO_BLEND_ALPHA    = 0.50      # blend strength
+BLEND_SHIFT          = 8         # fixed-point bits for the smear weights
 SMEAR_DURATION_MS    = 32        # smear lasts ~32ms
 OUTPUT_FPS           = 60000 / 1001   # 59.94 fps
 FRAME_CACHE_SIZE     = 48       # number of frames to cache
+DTW_ALIGNER          = "banded" # "banded" (linear memory) or "full" (librosa subsequence DTW)
+RENDER_MODE          = "python" # "python" (frames piped through numpy) or "ffmpeg" (schedule as a filtergraph)
+SEGMENT_MIN_FRAMES   = 600      # --segments: fewest output frames (~10 s) per parallel segment
+CHECKPOINT_FRAMES    = 18000    # longer outputs render in resumable pieces of about this many frames (0 = never)
+CHECKPOINT_FILE      = "checkpoint.json"
+CHECKPOINT_VERSION   = 1
+WARP_FILE            = "warp.npz"
 # ------------------------------
 
 def compute_features(y, sr):
+    import librosa
     S = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=N_MELS,
                                        hop_length=HOP, fmax=sr//2)
     return librosa.power_to_db(S[:, ::TIME_DECIM], ref=np.max)
@@ -54,95 +78,444 @@ def build_time_map_from_wp(wp, sr=TARGET_SR, hop=HOP, time_decim=TIME_DECIM):
 
     return t_skip, t_orig
 
-def time_compress_video(input_path, skippy_audio_path, output_path):
-    print("🔹 Loading video...")
-    video = VideoFileClip(input_path)
-    video_fps = float(video.fps)
+def frame_schedule(warp, target_dur, video_fps, video_duration):
+    """Source frame index and smear flag for every output frame, computed up front."""
+    eps = 1.0/OUTPUT_FPS
+    t_out = np.arange(int(np.ceil(target_dur*OUTPUT_FPS))) / OUTPUT_FPS
+    t_src = warp.to_orig(t_out)
+    t_src = np.clip(t_src, 0.0, video_duration-eps)
+    src_idx = np.floor(t_src*video_fps).astype(np.int64)
+
+    # smear logic: 32 ms window, forward-looking
+    smear_frames = max(1, int(round((SMEAR_DURATION_MS/1000.0)*video_fps)))
+    smear = (src_idx>0) & ((src_idx % MICRO_BLEND_FRAMES)<smear_frames)
+    return src_idx, smear
+
+def piecewise_expr(var, starts, leaves):
+    """ffmpeg expression for leaves[j] where starts[j] <= var < starts[j+1], as a balanced if() tree."""
+    if len(leaves) == 1:
+        return leaves[0]
+    mid = len(leaves) // 2
+    return (f"if(lt({var},{starts[mid]}),{piecewise_expr(var, starts[:mid], leaves[:mid])},"
+            f"{piecewise_expr(var, starts[mid:], leaves[mid:])})")
+
+def pts_runs(pts, rate):
+    """
+    Split a non-decreasing integer sequence (one value per source frame) into runs that are
+    either constant or exactly floor((N*p + r)/q) with p/q = rate, as (starts, leaf expressions).
+    """
+    p, q = rate.numerator, rate.denominator
+    lo = pts*q - np.arange(len(pts))*p        # floor((N*p + r)/q) == pts[N]  <=>  lo[N] <= r <= lo[N] + q-1
+    starts, leaves = [], []
+    a, n = 0, len(pts)
+    while a < n:
+        b_const = a + 1
+        while b_const < n and pts[b_const] == pts[a]:
+            b_const += 1
+        rmin = rmax = lo[a]
+        b_lin = a + 1
+        while b_lin < n and max(rmax, lo[b_lin]) - min(rmin, lo[b_lin]) < q:
+            rmin, rmax = min(rmin, lo[b_lin]), max(rmax, lo[b_lin])
+            b_lin += 1
+        starts.append(a)
+        if b_const >= b_lin:
+            leaves.append(str(pts[a]))
+            a = b_const
+        else:
+            leaves.append(f"floor((N*{p}+{rmax})/{q})")
+            a = b_lin
+    return starts, leaves
+
+def schedule_filtergraph(src_idx, smear, video_fps, n_src, alpha=MICRO_BLEND_ALPHA):
+    """
+    The output schedule as a filtergraph from [0:v] to [v]: every source frame gets the output
+    slot where it is first shown (setpts), frames the schedule skips get the slot of the next
+    shown frame, and the fps filter repeats or drops frames to fill every 59.94p slot. Smeared
+    source frames are blended with the next one in RGB, like SmearBlender.
+    """
+    out_rate = Fraction(OUTPUT_FPS).limit_denominator(1001)
+    src_rate = Fraction(video_fps).limit_denominator(1001)
+    n_out = len(src_idx)
+    pts = np.searchsorted(src_idx, np.arange(n_src), side="left")
+    starts, leaves = pts_runs(pts, out_rate / src_rate)
+    # frames past the source length ffmpeg still decodes land after the last output slot
+    starts.append(n_src); leaves.append(str(n_out))
+    retime = (f"settb={out_rate.denominator}/{out_rate.numerator},"
+              f"setpts='{piecewise_expr('N', starts, leaves)}',fps={out_rate.numerator}/{out_rate.denominator}")
+
+    src_smear = np.zeros(n_src, dtype=bool)
+    src_smear[src_idx[smear]] = True
+    if np.any(src_smear[src_idx] != smear):
+        raise ValueError("schedule smears a source frame only some of the times it is shown")
+    w = int(round(alpha*(1<<BLEND_SHIFT)))
+    if not src_smear.any() or w == 0:
+        return f"[0:v]{retime}[v]"
+    edges = np.flatnonzero(np.diff(src_smear.astype(np.int8))) + 1
+    flag_starts = [0] + edges.tolist()
+    flag_leaves = ["1" if src_smear[a] else "0" for a in flag_starts]
+    mode = "all_mode=average" if w == 1<<(BLEND_SHIFT-1) else \
+           f"all_expr='floor((A*{(1<<BLEND_SHIFT)-w}+B*{w})/{1<<BLEND_SHIFT})'"
+    # through rgb24 both ways, like the FrameReader/FrameWriter pipes, so the colours match
+    return (f"[0:v]setpts=PTS-STARTPTS,format=rgb24,format=gbrp,split[cur][nxt];"
+            f"[nxt]trim=start_frame=1,setpts=PTS-STARTPTS[next];"
+            f"[cur][next]blend={mode}:repeatlast=1:enable='{piecewise_expr('n', flag_starts, flag_leaves)}',"
+            f"{retime},format=rgb24[v]")
+
+class SmearBlender:
+    """
+    Fixed-point smear kernel: out = (f0*(256-w) + f1*w) >> 8 with w = alpha*256, computed in
+    per-thread uint16 scratch into a ring of reusable uint8 output buffers (no per-frame
+    allocations). For alpha 0.5 this is exactly the old float32 blend-and-truncate.
+    """
 
-    tmp_wav = os.path.join(os.path.dirname(output_path),"ref_for_dtw.wav")
-    if not os.path.exists(tmp_wav):
-        video.audio.write_audiofile(tmp_wav, fps=TARGET_SR,
-                                    nbytes=2, codec="pcm_s16le",
-                                    verbose=False, logger=None)
+    def __init__(self, shape, alpha, n_buffers):
+        self.shape = tuple(shape)
+        self.w = int(round(alpha*(1<<BLEND_SHIFT)))
+        self.free = deque(np.empty(self.shape, dtype=np.uint8) for _ in range(n_buffers))
+        self.local = threading.local()
 
-    print("🔹 Loading audio for DTW...")
-    y_orig,_ = librosa.load(tmp_wav, sr=TARGET_SR, mono=True)
-    y_skip,_ = librosa.load(skippy_audio_path, sr=TARGET_SR, mono=True)
+    def acquire(self):
+        return self.free.popleft()
 
-    print("🔹 Computing features...")
-    S_orig, S_skip = compute_features(y_orig, TARGET_SR), compute_features(y_skip, TARGET_SR)
+    def release(self, buf):
+        self.free.append(buf)
 
-    print("🔹 Running DTW...")
-    _, wp = librosa.sequence.dtw(X=S_orig, Y=S_skip, metric='euclidean', subseq=True)
+    def blend(self, frame0, frame1, out):
+        scratch = getattr(self.local, "scratch", None)
+        if scratch is None:
+            scratch = self.local.scratch = (np.empty(self.shape, np.uint16), np.empty(self.shape, np.uint16))
+        acc, tmp = scratch
+        np.multiply(frame0, (1<<BLEND_SHIFT)-self.w, out=acc, dtype=np.uint16)
+        np.multiply(frame1, self.w, out=tmp, dtype=np.uint16)
+        acc += tmp
+        acc >>= BLEND_SHIFT
+        np.copyto(out, acc, casting="unsafe")
+        return out
+
+def cached_features(path, load, source):
+    """Mel features of `path` through the analysis cache; `load()` decodes it on a miss."""
+    key = cache.make_key("mel", [path], sr=TARGET_SR, n_mels=N_MELS, hop=HOP,
+                         time_decim=TIME_DECIM, source=source) if cache.enabled() else None
+    hit = cache.get(key) if key else None
+    if hit is not None:
+        return hit["S"]
+    with metrics.stage("features"):
+        S = compute_features(load(), TARGET_SR)
+    if key:
+        cache.put(key, S=S)
+    return S
+
+def time_map_from_dtw(input_path, skippy_audio_path, aligner=DTW_ALIGNER):
+    import librosa   # only the DTW path needs it; imported here to keep plan-based runs light
+    params = dict(sr=TARGET_SR, n_mels=N_MELS, hop=HOP, time_decim=TIME_DECIM, aligner=aligner)
+    if aligner != "full":
+        params.update(band_frac=DTW_BAND_FRAC, radius=DTW_RADIUS, min_size=DTW_MIN_SIZE)
+    key = cache.make_key("dtw", [input_path, skippy_audio_path], **params) if cache.enabled() else None
+    hit = cache.get(key) if key else None
+    if hit is not None:
+        print("🔹 DTW path reused from cache")
+        wp = hit["wp"]
+    else:
+        print("🔹 Loading audio and computing features for DTW...")
+        # reference decoded straight from the source, no temp WAV
+        S_orig = cached_features(input_path, lambda: read_audio(input_path, TARGET_SR), "ffmpeg")
+        S_skip = cached_features(skippy_audio_path,
+                                 lambda: librosa.load(skippy_audio_path, sr=TARGET_SR, mono=True)[0], "librosa")
+
+        with metrics.stage("dtw"):
+            if aligner == "full":
+                print("🔹 Running DTW...")
+                _, wp = librosa.sequence.dtw(X=S_orig, Y=S_skip, metric='euclidean', subseq=True)
+            else:
+                print("🔹 Running banded DTW...")
+                wp = banded_dtw(S_orig, S_skip, slope=S_skip.shape[1]/S_orig.shape[1])
+        if key:
+            cache.put(key, wp=np.asarray(wp, dtype=np.int64))
 
     print("🔹 Building time map...")
-    t_skip_map, t_orig_map = build_time_map_from_wp(wp)
-    map_path = os.path.join(os.path.dirname(output_path),"map_t_skip_to_t_orig.npy")
-    np.save(map_path, np.vstack([t_skip_map,t_orig_map]).T)
-    print(f"✅ Saved subtitle mapping: {map_path}")
+    with metrics.stage("time_map"):
+        return WarpMap.from_points(*build_time_map_from_wp(wp))
 
-    skippy_audio = AudioFileClip(skippy_audio_path)
-    target_dur = float(skippy_audio.duration)
+def render_frames(input_path, output_path, src_idx, smear, next_idx, size, video_fps, audio_path=None,
+                  encoder=None, workers=1, start_index=0, progress=None):
+    """
+    Decode, smear and encode the scheduled frames in order through ffmpeg pipes, decoding from
+    source frame `start_index`. Returns (frames decoded, decoder restarts, frames written).
+    """
+    reader = FrameReader(input_path, size, video_fps, cache_size=FRAME_CACHE_SIZE, start_index=start_index)
+    # Frames are read in order on this thread, smeared in the pool and written in order.
+    # Non-smear frames go straight from the decoder to the encoder.
+    max_pending = 2*workers
+    blender = SmearBlender((size[1], size[0], 3), MICRO_BLEND_ALPHA, max_pending+1)
 
-    def map_t_skip_to_t_orig(t):
-        return np.interp(t, t_skip_map, t_orig_map,
-                         left=t_orig_map[0], right=t_orig_map[-1])
+    def get_frame(idx):
+        with metrics.timed("decode"):
+            return reader.get(idx)
 
-    eps = 1.0/OUTPUT_FPS
-    last_frame_time, last_frame = None, None
-    def get_frame_safe(t_request):
-        nonlocal last_frame_time, last_frame
-        t_request = max(0.0, min(t_request, video.duration-eps))
-        if last_frame_time is not None and abs(t_request-last_frame_time)<1e-6:
-            return last_frame
-        f = video.get_frame(t_request)
-        last_frame_time, last_frame = t_request, f
-        return f
-
-    print(f"🔹 Rendering frames: {int(target_dur*OUTPUT_FPS)} @ {OUTPUT_FPS:.3f} fps...")
-    def make_frame(t_out):
-        t_src = map_t_skip_to_t_orig(t_out)
-        t_src = max(0.0, min(t_src, video.duration-eps))
-        f_src = t_src*video_fps
-        frame_idx = int(np.floor(f_src))
-
-        t0 = frame_idx/video_fps
-        t1 = min((frame_idx+1)/video_fps, video.duration)
-        frame0 = get_frame_safe(t0).astype(np.float32)
-        frame1 = get_frame_safe(t1).astype(np.float32)
-        base_frame = frame0
-
-        # smear logic: 32 ms window, forward-looking
-        smear_frames = max(1, int(round((SMEAR_DURATION_MS/1000.0)*video_fps)))
-        if frame_idx>0 and (frame_idx % MICRO_BLEND_FRAMES)<smear_frames:
-            next_t = min((frame_idx+1)/video_fps, video.duration-eps)
-            next_frame = get_frame_safe(next_t).astype(np.float32)
-            out_frame = (1.0-MICRO_BLEND_ALPHA)*base_frame + MICRO_BLEND_ALPHA*next_frame
-        else:
-            out_frame = base_frame
+    def blend(frame0, frame1, buf):
+        with metrics.timed("blend"):
+            return blender.blend(frame0, frame1, buf)
 
-        return np.clip(out_frame,0,255).astype(np.uint8)
+    with FrameWriter(output_path, size, OUTPUT_FPS, audio_path=audio_path, settings=encoder) as writer, \
+         ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
 
-    total_frames = int(np.ceil(target_dur*OUTPUT_FPS))
-    pbar = tqdm(total=total_frames, desc="Rendering frames", unit="frame")
-    warped_pb = VideoClip(lambda t: (pbar.update(1), make_frame(t))[1], duration=target_dur)
-    warped_pb = warped_pb.set_audio(skippy_audio.set_duration(target_dur))
+        def flush_one():
+            job, buf = pending.popleft()
+            frame = job if buf is None else job.result()
+            with metrics.timed("encode"):
+                writer.write(frame)
+            if buf is not None:
+                blender.release(buf)
+            if progress:
+                progress(1)
+
+        for k in range(len(src_idx)):
+            frame0 = get_frame(src_idx[k])
+            if smear[k]:
+                buf = blender.acquire()
+                pending.append((pool.submit(blend, frame0, get_frame(next_idx[k]), buf), buf))
+            else:
+                pending.append((frame0, None))
+            while len(pending) > max_pending:
+                flush_one()
+        while pending:
+            flush_one()
+        with metrics.timed("encode"):
+            writer.close()   # flush the encoder inside the render stage
+    reader.close()
+    return reader.frames_decoded, reader.restarts, writer.frames_written
+
+def render_native(input_path, output_path, src_idx, smear, video_fps, n_src, audio_path=None, encoder=None,
+                  start_index=0, progress=None):
+    """Render the schedule in a single ffmpeg process (see schedule_filtergraph); returns frames written."""
+    graph = schedule_filtergraph(src_idx - start_index, smear, video_fps, n_src - start_index)
+    return render_filtergraph(input_path, graph, output_path, len(src_idx), audio_path=audio_path,
+                              settings=encoder, progress=progress, start_time=start_index/video_fps)
+
+def _render_segment(job, progress=None):
+    """
+    Process-pool entry point: one output segment into its own file, without audio.
+    progress(n) is called with the number of frames written since the last call.
+    """
+    render, input_path, part_path, src_idx, smear, next_idx, size, video_fps, n_src, encoder, workers = job
+    start = int(src_idx[0])
+    if render == "ffmpeg":
+        # the schedule only needs the segment's source range (plus the frame a last smear reads)
+        n_src = min(n_src, int(src_idx[-1]) + 2)
+        written = 0
+        def native_progress(n):   # render_filtergraph reports a running total
+            nonlocal written
+            if progress:
+                progress(n - written)
+            written = n
+        return 0, 0, render_native(input_path, part_path, src_idx, smear, video_fps, n_src,
+                                   encoder=encoder, start_index=start, progress=native_progress)
+    return render_frames(input_path, part_path, src_idx, smear, next_idx, size, video_fps,
+                         encoder=encoder, workers=workers, start_index=start, progress=progress)
 
-    warped_pb.write_videofile(output_path, codec="libx264", audio_codec="aac",
-                              fps=OUTPUT_FPS, threads=4, preset="fast",
-                              verbose=False, logger=None)
+def _file_stamp(path):
+    st = os.stat(path)
+    return [os.path.realpath(path), st.st_size, st.st_mtime_ns]
+
+def checkpoint_key(input_path, skippy_audio_path, plan_path, aligner, render, encoder):
+    """Everything a render's pieces depend on; a checkpoint saved under another key is stale."""
+    return {"version": CHECKPOINT_VERSION,
+            "inputs": [_file_stamp(p) for p in (input_path, skippy_audio_path, plan_path) if p],
+            "aligner": None if plan_path else aligner, "render": render, "encoder": asdict(encoder),
+            "smear": [MICRO_BLEND_FRAMES, MICRO_BLEND_ALPHA, SMEAR_DURATION_MS], "fps": OUTPUT_FPS}
+
+def load_checkpoint(parts_dir, key, bounds):
+    """The checkpoint in parts_dir if it was saved for this key and these pieces, else None."""
+    try:
+        with open(os.path.join(parts_dir, CHECKPOINT_FILE), encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("key") != key or state.get("bounds") != [list(ab) for ab in bounds] or \
+       not os.path.exists(os.path.join(parts_dir, WARP_FILE)):
+        return None
+    return state
+
+def save_checkpoint(parts_dir, state):
+    tmp = os.path.join(parts_dir, CHECKPOINT_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, os.path.join(parts_dir, CHECKPOINT_FILE))
+
+def render_segments(input_path, output_path, src_idx, smear, next_idx, size, video_fps, n_src, bounds, state,
+                    processes=1, audio_path=None, encoder=None, workers=None, render=RENDER_MODE):
+    """
+    Render each (a, b) slice of the output timeline from its own source range with its own decoder
+    and encoder into <output>.parts, `processes` at a time (each in its own process), then join
+    them with a stream-copy concat (every piece starts on a keyframe of its own encoder) while
+    muxing the audio. Finished pieces are recorded in the checkpoint `state` as they complete and
+    skipped when it already lists them. Returns the summed counts of render_frames.
+    """
+    encoder = encoder or EncoderSettings()
+    cores = os.cpu_count() or 1
+    processes = max(1, min(processes, len(bounds)))
+    if encoder.threads == 0:
+        encoder = replace(encoder, threads=max(1, cores // processes))
+    workers = max(1, (workers or cores) // processes)
+    parts_dir = output_path + ".parts"
+    ext = os.path.splitext(output_path)[1]
+    parts = [os.path.join(parts_dir, f"part{k:04d}{ext}") for k in range(len(bounds))]
+    done = set(k for k in state["done"] if os.path.exists(parts[k]))
+    todo = [k for k in range(len(bounds)) if k not in done]
+    if done:
+        print(f"🔹 Resuming: {len(done)}/{len(bounds)} segments already rendered "
+              f"(output frames 0-{state['next_frame']-1} done)")
+    jobs = {k: (render, input_path, parts[k][:-len(ext)] + ".partial" + ext,
+                src_idx[a:b], smear[a:b], next_idx[a:b], size, video_fps, n_src, encoder, workers)
+            for k, (a, b) in enumerate(bounds) if k in todo}
+    print(f"🔹 Rendering {len(todo)} segments ({processes} at a time)...")
+    totals = np.zeros(3, dtype=np.int64)
+    # one bar over the whole output: per frame in-process, per finished piece from a pool
+    pbar = tqdm(total=len(src_idx), initial=sum(b-a for k, (a, b) in enumerate(bounds) if k in done),
+                desc="Rendering frames", unit="frame")
+
+    def finish(k, counts):
+        nonlocal totals
+        totals += counts
+        os.replace(jobs[k][2], parts[k])
+        done.add(k)
+        state["done"] = sorted(done)
+        state["next_frame"] = next((a for j, (a, _) in enumerate(bounds) if j not in done), len(src_idx))
+        save_checkpoint(parts_dir, state)
+        pbar.write(f"✅ Segment {k+1}/{len(bounds)}: output frames {bounds[k][0]}-{bounds[k][1]-1}")
+
+    if processes == 1:
+        for k in todo:
+            finish(k, _render_segment(jobs[k], progress=pbar.update))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(_render_segment, jobs[k]): k for k in todo}
+            for fut in as_completed(futures):
+                k = futures[fut]
+                finish(k, fut.result())
+                pbar.update(bounds[k][1] - bounds[k][0])
     pbar.close()
+    with metrics.stage("concat"):
+        concat_files(parts, output_path, audio_path=audio_path, settings=encoder)
+    shutil.rmtree(parts_dir)
+    return tuple(int(v) for v in totals)
+
+def time_compress_video(input_path, skippy_audio_path, output_path, plan_path=None, aligner=DTW_ALIGNER,
+                        encoder=None, workers=None, render=RENDER_MODE, segments=1,
+                        checkpoint_frames=CHECKPOINT_FRAMES):
+    from moviepy.editor import VideoFileClip
+    print("🔹 Loading video...")
+    with metrics.stage("load"):
+        # metadata only: close the clip so its ffmpeg reader isn't kept alive through the render
+        video = VideoFileClip(input_path)
+        video_fps, video_duration, video_size = float(video.fps), video.duration, video.size
+        video.close()
+    encoder = encoder or EncoderSettings()
+    target_dur = float(sf.info(skippy_audio_path).duration)
+
+    # Long outputs (and --segments) render in pieces under <output>.parts with a checkpoint,
+    # so a rerun on the same inputs picks up at the first unfinished piece.
+    total_frames = int(np.ceil(target_dur*OUTPUT_FPS))
+    pieces = max(segments, -(-total_frames // checkpoint_frames) if checkpoint_frames else 1)
+    bounds = segment_bounds(total_frames, pieces, SEGMENT_MIN_FRAMES)
+    parts_dir = output_path + ".parts"
+    state = None
+    if len(bounds) > 1:
+        key = checkpoint_key(input_path, skippy_audio_path, plan_path, aligner, render, encoder)
+        state = load_checkpoint(parts_dir, key, bounds)
+        if state is None:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+            os.makedirs(parts_dir)
+            state = {"key": key, "bounds": [list(ab) for ab in bounds], "done": [], "next_frame": 0}
+
+    if state and state["done"]:
+        print(f"🔹 Reusing the time map of the interrupted render: {os.path.join(parts_dir, WARP_FILE)}")
+        warp = WarpMap.load(os.path.join(parts_dir, WARP_FILE))
+    elif plan_path:
+        # The skip plan already knows every removed sample range, so the map is exact.
+        print(f"🔹 Building time map from skip plan: {plan_path}")
+        with metrics.stage("time_map"):
+            plan, plan_sr, total_samples, crossfade_ms = load_plan(plan_path)
+            warp = WarpMap.from_plan(plan.removals, total_samples, plan_sr, crossfade_ms)
+    else:
+        warp = time_map_from_dtw(input_path, skippy_audio_path, aligner=aligner)
+
+    map_path = os.path.join(os.path.dirname(output_path), MAP_FILENAME)
+    warp.save(map_path)
+    print(f"✅ Saved subtitle mapping: {map_path} ({len(warp)} breakpoints)")
+    if state is not None:
+        warp.save(os.path.join(parts_dir, WARP_FILE))
+        save_checkpoint(parts_dir, state)
+
+    eps = 1.0/OUTPUT_FPS
+    last_idx = int(video_fps*(video_duration-eps) + 1e-5)
+    src_idx, smear = frame_schedule(warp, target_dur, video_fps, video_duration)
+    next_idx = np.minimum(src_idx+1, last_idx)
+    metrics.count("smear_frames", int(smear.sum()))
+    metrics.count("warp_breakpoints", len(warp))
+
+    workers = workers or os.cpu_count() or 1
+    decoded = restarts = 0
+    with metrics.stage("render"):
+        if state is not None:
+            decoded, restarts, written = render_segments(
+                input_path, output_path, src_idx, smear, next_idx, video_size, video_fps, last_idx+1, bounds, state,
+                processes=segments, audio_path=skippy_audio_path, encoder=encoder, workers=workers, render=render)
+        else:
+            how = "ffmpeg filtergraph" if render == "ffmpeg" else f"{workers} blend workers"
+            print(f"🔹 Rendering frames: {total_frames} @ {OUTPUT_FPS:.3f} fps ({how})...")
+            pbar = tqdm(total=total_frames, desc="Rendering frames", unit="frame")
+            if render == "ffmpeg":
+                written = render_native(input_path, output_path, src_idx, smear, video_fps, last_idx+1,
+                                        audio_path=skippy_audio_path, encoder=encoder,
+                                        progress=lambda n: pbar.update(n - pbar.n))
+            else:
+                decoded, restarts, written = render_frames(
+                    input_path, output_path, src_idx, smear, next_idx, video_size, video_fps,
+                    audio_path=skippy_audio_path, encoder=encoder, workers=workers, progress=pbar.update)
+            pbar.close()
+    metrics.count("frames_written", written)
+    if render != "ffmpeg":
+        metrics.count("frames_decoded", decoded)
+        metrics.count("decoder_restarts", restarts)
+        print(f"🔹 Decoded {decoded} source frames ({restarts} decoder restarts)")
 
-    try: os.remove(tmp_wav)
-    except: pass
     print(f"✅ Done! Video saved: {output_path}")
 
+def add_encoder_args(ap):
+    d = EncoderSettings()
+    ap.add_argument("--codec", default=d.codec, help="ffmpeg video encoder (default: %(default)s)")
+    ap.add_argument("--preset", default=d.preset, help="encoder preset (default: %(default)s)")
+    ap.add_argument("--crf", type=float, help="constant quality (overrides --bitrate)")
+    ap.add_argument("--bitrate", help="video bitrate, e.g. 12M")
+    ap.add_argument("--threads", type=int, default=d.threads, help="encoder threads (0 = auto)")
+    ap.add_argument("--audio-bitrate", help="audio bitrate, e.g. 512k")
+    ap.add_argument("--workers", type=int, help="frame blending threads (default: all cores)")
+    ap.add_argument("--render", choices=["python","ffmpeg"], default=RENDER_MODE,
+                    help="python: frames blended in numpy; ffmpeg: schedule compiled to a filtergraph")
+    ap.add_argument("--segments", type=int, default=1,
+                    help="render this many slices of the output in parallel processes, then concat")
+    ap.add_argument("--checkpoint-frames", type=int, default=CHECKPOINT_FRAMES,
+                    help="outputs longer than this many frames (default %(default)s, ~5 min) render in resumable "
+                         "pieces joined by a stream-copy concat instead of one pass; 0 = single pass")
+
+def encoder_from_args(args):
+    return EncoderSettings(codec=args.codec, preset=args.preset, crf=args.crf, bitrate=args.bitrate,
+                           threads=args.threads, audio_bitrate=args.audio_bitrate)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("-i","--input", required=True)
     ap.add_argument("-s","--skippy", required=True)
     ap.add_argument("-o","--output", required=True)
+    ap.add_argument("-p","--plan", help="Skip plan sidecar (*_plan.npz) from the audio engine; bypasses DTW")
+    ap.add_argument("--aligner", choices=["banded","full"], default=DTW_ALIGNER,
+                    help="DTW engine when no plan is given (banded: coarse-to-fine, linear memory)")
+    add_encoder_args(ap)
     args = ap.parse_args()
-    time_compress_video(args.input, args.skippy, args.output)
+    time_compress_video(args.input, args.skippy, args.output, plan_path=args.plan, aligner=args.aligner,
+                        encoder=encoder_from_args(args), workers=args.workers, render=args.render,
+                        segments=args.segments, checkpoint_frames=args.checkpoint_frames)
 
 if __name__=="__main__": main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+warpmap.py  —  The t_skip <-> t_orig time map shared by video, subtitles and markers.
+
+A WarpMap is a monotone piecewise-linear breakpoint list. Points that lie on the
+line through their neighbours (to within WARP_TOL_S, measured along both axes) are
+dropped, so a DTW map at frame resolution shrinks to its real corners. Lookups are
+vectorized binary searches in either direction: to_orig() for rendering (output
+time -> source time) and to_skip() for retiming subtitles and markers (source
+time -> output time).
+
+Saved as a small versioned .npz; legacy map_t_skip_to_t_orig.npy files (raw
+[t_skip, t_orig] rows) still load.
+"""
+
+from dataclasses import dataclass
+import numpy as np
+
+WARPMAP_VERSION = 1
+WARP_TOL_S      = 1e-4    # max lookup error (s) allowed when dropping breakpoints
+MAP_FILENAME    = "map_t_skip_to_t_orig.npz"
+
+def _simplify(x: np.ndarray, y: np.ndarray, tol: float) -> np.ndarray:
+    """Mask of breakpoints to keep so neither y(x) nor x(y) moves by more than `tol`."""
+    n = x.shape[0]
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n-1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        # |cross| / dx is the error in y at that x, |cross| / dy the error in x at that y
+        cross = np.abs((y[a+1:b] - y[a])*dx - (x[a+1:b] - x[a])*dy)
+        k = int(np.argmax(cross))
+        if cross[k] > tol*min(dx, dy):
+            m = a + 1 + k
+            keep[m] = True
+            stack += [(a, m), (m, b)]
+    return keep
+
+@dataclass
+class WarpMap:
+    t_skip: np.ndarray   # output (skippy) timeline, seconds, non-decreasing
+    t_orig: np.ndarray   # source timeline, seconds, non-decreasing
+
+    @classmethod
+    def from_points(cls, t_skip, t_orig, tol: float = WARP_TOL_S) -> "WarpMap":
+        t_skip = np.asarray(t_skip, dtype=np.float64)
+        t_orig = np.asarray(t_orig, dtype=np.float64)
+        if t_skip.ndim != 1 or t_skip.shape != t_orig.shape or t_skip.shape[0] == 0:
+            raise ValueError("t_skip and t_orig must be equal-length, non-empty 1-D arrays")
+        if np.any(np.diff(t_skip) < 0) or np.any(np.diff(t_orig) < 0):
+            raise ValueError("warp map must be monotone (non-decreasing) in both t_skip and t_orig")
+        if t_skip.shape[0] > 2:
+            keep = _simplify(t_skip, t_orig, tol)
+            t_skip, t_orig = t_skip[keep], t_orig[keep]
+        return cls(t_skip, t_orig)
+
+    @classmethod
+    def from_plan(cls, removals, total_samples, sr, crossfade_ms) -> "WarpMap":
+        """Exact map of a rendered skip plan."""
+        from tempo_cut.skippy import time_map_from_plan
+        return cls.from_points(*time_map_from_plan(removals, total_samples, sr, crossfade_ms))
+
+    def __len__(self):
+        return self.t_skip.shape[0]
+
+    @property
+    def skip_duration(self) -> float:
+        return float(self.t_skip[-1])
+
+    def to_orig(self, t):
+        """Source time for output time(s) `t`; clamped to the ends of the map."""
+        return np.interp(t, self.t_skip, self.t_orig)
+
+    def to_skip(self, t):
+        """Output time for source time(s) `t`; clamped to the ends of the map."""
+        return np.interp(t, self.t_orig, self.t_skip)
+
+    # ---------- files ----------
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez_compressed(f, version=WARPMAP_VERSION, t_skip=self.t_skip, t_orig=self.t_orig)
+
+    @classmethod
+    def load(cls, path: str) -> "WarpMap":
+        data = np.load(path, allow_pickle=False)
+        if isinstance(data, np.ndarray):
+            # legacy .npy: one [t_skip, t_orig] row per DTW frame
+            if data.ndim != 2 or data.shape[1] != 2:
+                raise ValueError("Expected a 2D array with 2 columns (t_skip, t_orig).")
+            return cls.from_points(data[:, 0], data[:, 1])
+        with data:
+            version = int(data["version"])
+            if version != WARPMAP_VERSION:
+                raise ValueError(f"{path}: unsupported warp map version {version} (expected {WARPMAP_VERSION})")
+            return cls(data["t_skip"], data["t_orig"])
@@ -1,41 +1,49 @@
-import sys
+import argparse
 import numpy as np
 from moviepy.editor import VideoFileClip
-import cv2
+from tempo_cut.ffio import FrameWriter, EncoderSettings
 
 # ✅ Take input/output paths from command line
-if len(sys.argv) < 3:
-    print("Usage: python time_compressor_FAST.py <input_video> <output_video>")
-    sys.exit(1)
+ap = argparse.ArgumentParser(usage="python time_compressor_FAST.py <input_video> <output_video> [--window N]")
+ap.add_argument("input")
+ap.add_argument("output")
+ap.add_argument("--window", type=int, default=20,
+                help="frames averaged into each output frame, itself plus the next N-1 (default 20)")
+args = ap.parse_args()
 
-INPUT_FILE = sys.argv[1]
-OUTPUT_FILE = sys.argv[2]
+INPUT_FILE = args.input
+OUTPUT_FILE = args.output
+WINDOW = max(1, args.window)
 
 # Load video
 video = VideoFileClip(INPUT_FILE)
+w, h = video.size
 
-# Strengthened smear: blend each frame with the NEXT 20 frames
-def smear_frame(get_frame, t):
-    frame = get_frame(t)
-    h, w, c = frame.shape
-    acc = np.zeros((h, w, c), dtype=np.float32)
-    count = 0
-    # Look ahead up to 20 frames (≈ 32ms @59.94p)
-    for i in range(20):
-        t_offset = t + i / video.fps
-        if t_offset < video.duration:
-            acc += get_frame(t_offset).astype(np.float32)
-            count += 1
-    return np.clip(acc / count, 0, 255).astype(np.uint8)
+# Strengthened smear: every output frame is the mean of itself and the NEXT WINDOW-1 frames.
+# One sequential pass: the last WINDOW decoded frames sit in a ring buffer next to their
+# running uint32 sum, so each frame costs one decode, one add and one subtract.
+ring = np.empty((WINDOW, h, w, 3), dtype=np.uint8)
+acc = np.zeros((h, w, 3), dtype=np.uint32)
+mean = np.empty((h, w, 3), dtype=np.uint32)
+out = np.empty((h, w, 3), dtype=np.uint8)
 
-smeared = video.fl(lambda gf, t: smear_frame(gf, t))
+def emit(writer, k, count):
+    """Write output frame k (the mean of the `count` frames in the window) and drop frame k."""
+    np.floor_divide(acc, count, out=mean)
+    np.copyto(out, mean, casting="unsafe")
+    writer.write(out)
+    np.subtract(acc, ring[k % WINDOW], out=acc, casting="unsafe")
 
 # Export at same fps
-smeared.write_videofile(
-    OUTPUT_FILE,
-    codec="libx264",
-    fps=video.fps,
-    preset="fast",
-    bitrate="6000k",
-    audio=False
-)
+settings = EncoderSettings(codec="libx264", preset="fast", bitrate="6000k")
+with FrameWriter(OUTPUT_FILE, video.size, video.fps, settings=settings) as writer:
+    n = 0
+    for frame in video.iter_frames():
+        ring[n % WINDOW] = frame
+        np.add(acc, ring[n % WINDOW], out=acc, casting="unsafe")
+        n += 1
+        if n >= WINDOW:
+            emit(writer, n - WINDOW, WINDOW)
+    # the last frames have fewer frames ahead of them
+    for k in range(max(0, n - WINDOW + 1), n):
+        emit(writer, k, n - k)